@@ -0,0 +1,162 @@
+# Required Imports
+import functools
+import inspect
+import math
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Budgets of a single worker process: memory shared by the jobs running at
+# the same time and CPU time of a single job. Set the variables to 0 to disable
+MEMORY_BUDGET_MB = float(os.environ.get("MONOSHOT_MEMORY_BUDGET_MB", "1024"))
+CPU_BUDGET_S = float(os.environ.get("MONOSHOT_CPU_BUDGET_S", "300"))
+
+# Images are never downscaled below this fraction of their size
+MIN_SCALE = 0.25
+POLL_INTERVAL = 0.2 # Seconds between checks of a queued job for cancellation
+
+# Admission decisions
+ADMIT, QUEUE, DOWNSCALE, REJECT = "admit", "queue", "downscale", "reject"
+
+# Predicted peak memory (bytes) and CPU time (seconds) of a job
+Estimate = namedtuple("Estimate", ["memory_bytes", "cpu_seconds"])
+Decision = namedtuple("Decision", ["action", "scale", "reason"])
+
+# Rough cost model: peak memory in bytes per input pixel and CPU seconds per
+# input megapixel (per frame for videos). Recalibrate with benchmark.py
+COSTS = {
+    "filter": (18, 0.5),
+    "enhance_resolution": (54, 8.0), # The output is 16 times larger
+    "enhanced_img": (42, 0.3),
+    "extract_txt": (8, 3.0),
+    "video_filter": (3, 0.05),
+    "shot": (3, 0.02),
+}
+FRAMES_IN_FLIGHT = 40 # Decoded and transformed frames held by a FramePipeline
+
+class ResourceLimitExceeded(Exception):
+    ''' Raised for jobs too heavy for the worker's budgets '''
+
+# Helper Functions
+def estimate(operation, width, height, frame_count=1, fps=30, params=None):
+    ''' Predict the peak memory and CPU time of an
+    operation from the size of its input '''
+    bytes_per_pixel, seconds_per_mp = COSTS[operation]
+    pixels = width * height
+    memory = pixels * bytes_per_pixel
+    cpu = pixels / 1e6 * seconds_per_mp
+
+    if operation in ("video_filter", "shot"):
+        memory *= FRAMES_IN_FLIGHT
+        cpu *= frame_count
+        if params and params.get("gif"): # Every (half size) GIF frame is kept until the end
+            kept_frames = frame_count / max(round(fps / params.get("gif_fps", 10)), 1)
+            memory += int(kept_frames * pixels / 4)
+
+    return Estimate(int(memory), cpu)
+
+# AdmissionController class for keeping jobs within the worker's budgets
+class AdmissionController:
+    def __init__(self, memory_budget_mb=MEMORY_BUDGET_MB, cpu_budget_s=CPU_BUDGET_S):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.cpu_budget = cpu_budget_s
+        self.enabled = bool(memory_budget_mb and cpu_budget_s)
+        self.__in_use = 0 # Memory reserved by running jobs
+        self.__changed = threading.Condition()
+
+    def decide(self, estimate, can_downscale=False):
+        ''' Admit a job that fits in the memory left, queue
+        it if it only fits once other jobs finish, downscale
+        its input if it never fits (when possible) and
+        reject it otherwise '''
+        over = max(estimate.memory_bytes / self.memory_budget,
+                   estimate.cpu_seconds / self.cpu_budget)
+        if over > 1:
+            scale = math.sqrt(1 / over) * 0.95 # Memory and CPU time grow with the pixels
+            if can_downscale and scale >= MIN_SCALE:
+                return Decision(DOWNSCALE, round(scale, 3),
+                                f"input downscaled to {scale:.0%} to fit the budgets")
+
+            return Decision(REJECT, None,
+                            f"needs about {estimate.memory_bytes / 2**20:.0f} MB and "
+                            f"{estimate.cpu_seconds:.0f}s of CPU, the limits are "
+                            f"{self.memory_budget / 2**20:.0f} MB and {self.cpu_budget:.0f}s")
+
+        with self.__changed:
+            if self.__in_use + estimate.memory_bytes > self.memory_budget:
+                return Decision(QUEUE, 1.0, "waiting for running jobs to free memory")
+
+        return Decision(ADMIT, 1.0, None)
+
+    @contextmanager
+    def reserve(self, memory_bytes, progress=None):
+        ''' Wait until the memory is available and hold it for
+        the block. The progress callback is called meanwhile,
+        so that cancelling a queued job stops the wait '''
+        memory_bytes = min(memory_bytes, self.memory_budget) # A lone job always fits
+        with self.__changed:
+            while self.__in_use + memory_bytes > self.memory_budget:
+                if progress:
+                    progress(0.0)
+                self.__changed.wait(POLL_INTERVAL)
+            self.__in_use += memory_bytes
+
+        try:
+            yield
+        finally:
+            with self.__changed:
+                self.__in_use -= memory_bytes
+                self.__changed.notify_all()
+
+    def in_use(self):
+        ''' Memory (bytes) reserved by running jobs '''
+        with self.__changed:
+            return self.__in_use
+
+# Controller shared by the whole process
+ADMISSION_CONTROLLER = AdmissionController()
+
+def admitted(operation, video=False, scale_param=None):
+    ''' Decorator for FileProcessor methods that estimates
+    the cost of the job from the probed size of the input
+    and admits, queues, downscales (through the method's
+    `scale_param` argument) or rejects it '''
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(processor, *args, **kwargs):
+            controller = ADMISSION_CONTROLLER
+            if not controller.enabled:
+                return method(processor, *args, **kwargs)
+
+            bound = signature.bind(processor, *args, **kwargs)
+            bound.apply_defaults()
+            if video:
+                metadata = processor.get_metadata()
+                width, height, frame_count = metadata.width, metadata.height, metadata.frame_count
+                fps = metadata.fps or 30
+            else:
+                (width, height), frame_count, fps = processor.get_image_size(), 1, 30
+
+            scale = bound.arguments.get(scale_param, 1.0) if scale_param else 1.0
+            job = estimate(operation, int(width * scale), int(height * scale),
+                           frame_count, fps, bound.arguments)
+            decision = controller.decide(job, can_downscale=scale_param is not None)
+
+            if decision.action == REJECT:
+                raise ResourceLimitExceeded(f"Input too large to {operation}: {decision.reason}")
+            if decision.action == DOWNSCALE:
+                bound.arguments[scale_param] = scale * decision.scale
+                job = Estimate(int(job.memory_bytes * decision.scale ** 2),
+                               job.cpu_seconds * decision.scale ** 2)
+
+            metrics = bound.arguments.get("metrics")
+            if metrics is not None:
+                metrics.count(f"admission_{decision.action}")
+
+            with controller.reserve(job.memory_bytes, bound.arguments.get("progress")):
+                return method(*bound.args, **bound.kwargs)
+        return wrapper
+    return decorator
@@ -1,36 +1,95 @@
 # Required Imports
 import streamlit as st # pip install streamlit
 from file_processing import FileProcessor
-import tempfile
+from super_resolution import MODEL_REGISTRY
+from encoders import VIDEO_ENCODER
+from jobs import JOB_EXECUTOR, DONE, CANCELLED
+from streamlit.report_thread import get_report_ctx
+from workspaces import WORKSPACES
 import os
-import shutil
+import threading
 import time
 
 # Helper Functions
-def get_file_data(file):
-    ''' Writes the uploaded file data
-    to a temporary file for processing'''
-    if not os.path.isdir("./temp_files"):
-        os.mkdir("./temp_files")
+def warm_up():
+    ''' Load the Super Resolution models and probe
+    the available video encoders ahead of time '''
+    MODEL_REGISTRY.warm_up()
+    VIDEO_ENCODER.select()
+
+@st.cache(allow_output_mutation=True)
+def start_warm_up():
+    ''' Warm up on a background thread (only once per
+    process), so that the first page renders right away
+    and jobs load whatever is still missing themselves '''
+    thread = threading.Thread(target=warm_up, daemon=True)
+    thread.start()
+
+    return thread
+
+def get_session_id():
+    ''' Id of the browser session running the app '''
+    ctx = get_report_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
+def get_file_data(file, workspace):
+    ''' Streams the uploaded file data into
+    the session's workspace for processing'''
+    return open(workspace.save_upload(file, file.name, getattr(file, "id", None)), "rb")
+
+def run_job(job_id, start, func, *args, **kwargs):
+    ''' Run the function as a background job (when start
+    is True) and display its real progress until it finishes.
+    Reruns of the app re-attach to the running job with the 
+    same id. Returns the job, if there is one to display.
+    Jobs hold on to the session's workspace until they finish '''
+    session_id = get_session_id()
+    job_id = f"{session_id}_{job_id}" # Jobs write to the session's own workspace
+    job = JOB_EXECUTOR.get(job_id)
+    if start and (job is None or job.finished()):
+        WORKSPACES.acquire(session_id)
+        job = JOB_EXECUTOR.submit(job_id, func, *args, **kwargs)
+        job.future.add_done_callback(lambda _: WORKSPACES.release(session_id))
+    elif job is None or job.finished(): # Nothing started in this run
+        return None
+
+    if st.sidebar.button("Cancel", key=f"cancel_{job_id}"):
+        JOB_EXECUTOR.cancel(job_id)
 
-    tempfile.tempdir = "temp_files" # Set the directory where all temp files will be stores
-    temp_file = tempfile.NamedTemporaryFile(suffix="file_for_processing")
-    temp_file.write(file.read())
-
-    return temp_file
-
-def display_progress_bar():
-    ''' Displays a progress bar to visualize
-    the completion of a function '''
     processing_txt = st.markdown("#### Processing, Please wait...")
     bar = st.progress(0)
-    for percent in range(100):
-        time.sleep(0.05)
-        bar.progress(percent)
+    while not job.finished(): # Poll the job for its progress
+        bar.progress(int(job.progress * 100))
+        time.sleep(0.1)
 
     bar.empty()
     processing_txt.empty()
 
+    return job
+
+def display_job_result(job, success_msg):
+    ''' Display the outcome of a finished job '''
+    if job is None:
+        return
+
+    if job.status == DONE:
+        display_msg(success_msg, 1)
+    elif job.status == CANCELLED:
+        display_msg("Processing has been cancelled.", 0)
+    else:
+        display_msg(f"Oops! Processing failed: {job.error}", -1)
+
+def display_preview(preview_func, *args, **kwargs):
+    ''' Display a low resolution preview of the output,
+    the full resolution one is only rendered on Generate '''
+    try:
+        preview = preview_func(*args, **kwargs)
+    except Exception as error:
+        display_msg(f"Oops! Preview not available: {error}", -1)
+    else:
+        if preview is not None:
+            st.image(preview, caption="Preview")
+
 def display_msg(msg, msg_type=0):
     ''' Display message according to the
     type 
@@ -38,22 +97,14 @@ def display_msg(msg, msg_type=0):
     0 -> Info Message
     -1 -> Error Message
     '''
-    msg_widget = st.empty()
-    
     if msg_type == 1:
-        msg_widget = st.success(msg)
-        time.sleep(3)
-        msg_widget.empty()
+        st.success(msg)
     
     elif msg_type == -1:
-        msg_widget = st.error(msg)
-        time.sleep(3)
-        msg_widget.empty()
+        st.error(msg)
     
     elif msg_type == 0:
-        msg_widget = st.info(msg)
-        time.sleep(3)
-        msg_widget.empty()
+        st.info(msg)
 
 def get_file_details(processed_file_path, processed_file_details, file_extension):
     ''' Dispalys the basic details of the file
@@ -68,8 +119,9 @@ def get_file_details(processed_file_path, processed_file_details, file_extension
         else:
             file.image(processed_file_path)
 
-def display_processed_file(processed_file_path, processed_files):
+def display_processed_file(workspace, processed_files):
     ''' Displays the processed file in web app '''
+    processed_file_path = workspace.processed + os.sep
     if not processed_files:
         display_msg("No files processed yet.", -1)
 
@@ -92,7 +144,7 @@ def display_processed_file(processed_file_path, processed_files):
     else:
         display_msg("You can only process and download a single file at a time", 0)
     
-    shutil.rmtree(processed_file_path)
+    workspace.clear_processed()
 
 def display_info_sections():
     ''' Displays the instructions and about section '''
@@ -105,6 +157,8 @@ def display_info_sections():
 
             * Once uploaded, select the enhacements you would like to apply from the sidebar.
 
+            * Filters and image enhancements show a quick, low resolution preview as you change them.
+
             * Click on the **Generate** button and wait for the processing to complete.
 
             * Once completed, click on the **Proceed to Download** button to generate the output.
@@ -132,7 +186,6 @@ def display_info_sections():
             #### Modules Utilized:
             - <a style="text-decoration: none;" href="http://streamlit.io/" target="blank_"> Streamlit </a>
             - <a style="text-decoration: none;" href="https://opencv.org/releases/" target="blank_"> OpenCV </a>
-            - <a style="text-decoration: none;" href="https://zulko.github.io/moviepy/" target="blank_"> MoviePy </a>
             - <a style="text-decoration: none;" href="https://pillow.readthedocs.io/en/3.0.x/index.html" target="blank_"> Pillow </a>
             - <a style="text-decoration: none;" href="https://numpy.org/" target="blank_"> NumPy </a>
 
@@ -151,6 +204,8 @@ def main():
     ICON = "./assets/favicon.png"
     st.set_page_config(page_title="MonoShot", page_icon=ICON)
 
+    start_warm_up() # Load the heavy backends in the background, once per process
+
     # Title
     TITLE_STYLE = '''
                 border: 3px solid #9ab7d6;
@@ -174,149 +229,164 @@ def main():
     st.subheader(HEADER)
 
     # File Upload and Selections
-    PROCESSED_DATA_PATH = "./processed_data/"
-
     uploaded_file = st.file_uploader("Upload your file here:",
                                     type=[".mp4", ".avi", ".mov", ".jpeg", ".jpg", ".png"])
     if uploaded_file:
-        file_data = get_file_data(uploaded_file)
-        processor = FileProcessor(file_data) # Processor object for applying diff. methods to the media file
+        # Every session works in a private directory, kept while referenced by this run or its jobs
+        with WORKSPACES.use(get_session_id()) as workspace:
+            file_data = get_file_data(uploaded_file, workspace)
+            processor = FileProcessor(file_data, workspace.digest(file_data.name)) # Processor object for applying diff. methods to the media file
 
-        if uploaded_file.type in ("video/mp4", "video/mov", "video/avi"):
-            if not os.path.isdir(PROCESSED_DATA_PATH):
-                os.mkdir(PROCESSED_DATA_PATH)
+            if uploaded_file.type in ("video/mp4", "video/mov", "video/avi"):
+                video_duration = processor.get_duration()
+                has_required_dim = processor.get_dimensions()
 
-            video_duration = processor.get_duration()
-            has_required_dim = processor.get_dimensions()
+                if not video_duration:
+                    display_msg("Oops! Video too short or could not be read!", -1)
 
-            if video_duration > 30:
-                display_msg("Oops! Video too long to be processed!", -1)
+                elif video_duration > 30:
+                    display_msg("Oops! Video too long to be processed!", -1)
             
-            elif not has_required_dim:
-                display_msg("Oops! Allowed Resolutions are: 360p, 480p, 720p and 1080p", -1)
-
-            else:
-                # SideBar Widgets 
-                select_options = ["Enhance Image", "Generate Shot"]
-                select_output = st.sidebar.selectbox("Select Enhancement:", select_options)
+                elif not has_required_dim:
+                    display_msg("Oops! Allowed Resolutions are: 360p, 480p, 720p and 1080p", -1)
 
-                if select_output:
-                    time.sleep(1.5)
-                    if select_output == "Enhance Image":
-                        time_stamp = st.sidebar.slider("Choose the time stamp (in seconds)", 
-                                                    min_value=1, max_value=video_duration, 
-                                                    step=1)
-                        brightness_lvl = st.sidebar.slider("Brightness:", 
-                                                    min_value=0.0, max_value=2.0, 
-                                                    step=0.2, value=1.0)
-                        sharpness_lvl = st.sidebar.slider("Sharpness:", 
-                                                    min_value=0.0, max_value=2.0, 
-                                                    step=0.2, value=1.0)
-                        contrast_lvl = st.sidebar.slider("Contrast:", 
-                                                    min_value=0.0, max_value=2.0, 
-                                                    step=0.2, value=1.0)
-                        color_lvl = st.sidebar.slider("Color:", 
-                                                    min_value=0.0, max_value=2.0, 
-                                                    step=0.2, value=1.0)
-
-                        if st.sidebar.button("Generate"):
-                            processor.enhanced_img(PROCESSED_DATA_PATH, time_stamp*1000, # Timestamp should be in milliseconds
-                                                    brightness_lvl, sharpness_lvl, 
-                                                    contrast_lvl, color_lvl) 
-                            display_progress_bar()
-                            display_msg("Enhanced Image has been successfully generated.", 1)
-
-                    elif select_output == "Generate Shot":
-                        display_msg("NOTE: It may take a while to generate a shot.", 0)
-
-                        shot_options = ["SlowMo", "TimeLapse", "GIF", "Boomerang"]
-                        shot = st.sidebar.selectbox("Select Shot:", shot_options)
-
-                        if shot == "SlowMo" and st.sidebar.button("Generate"):
-                            processor.generate_shot(PROCESSED_DATA_PATH, slowmo=True)
-                            display_progress_bar()
-                            display_msg("SlowMo has been successfully generated.", 1)
+                else:
+                    # SideBar Widgets 
+                    select_options = ["Enhance Image", "Generate Shot", "Apply Filter"]
+                    select_output = st.sidebar.selectbox("Select Enhancement:", select_options)
+
+                    if select_output:
+                        if select_output == "Enhance Image":
+                            time_stamp = st.sidebar.slider("Choose the time stamp (in seconds)", 
+                                                        min_value=1, max_value=video_duration, 
+                                                        step=1)
+                            brightness_lvl = st.sidebar.slider("Brightness:", 
+                                                        min_value=0.0, max_value=2.0, 
+                                                        step=0.2, value=1.0)
+                            sharpness_lvl = st.sidebar.slider("Sharpness:", 
+                                                        min_value=0.0, max_value=2.0, 
+                                                        step=0.2, value=1.0)
+                            contrast_lvl = st.sidebar.slider("Contrast:", 
+                                                        min_value=0.0, max_value=2.0, 
+                                                        step=0.2, value=1.0)
+                            color_lvl = st.sidebar.slider("Color:", 
+                                                        min_value=0.0, max_value=2.0, 
+                                                        step=0.2, value=1.0)
+
+                            display_preview(processor.preview_enhanced_img, time_stamp*1000, 
+                                            brightness_lvl, sharpness_lvl, contrast_lvl, color_lvl)
+
+                            job = run_job(f"{processor.get_digest()}_enhanced_img_{time_stamp}_{brightness_lvl}"
+                                          f"_{sharpness_lvl}_{contrast_lvl}_{color_lvl}",
+                                          st.sidebar.button("Generate"), processor.enhanced_img, 
+                                          workspace.processed, time_stamp*1000, # Timestamp should be in milliseconds
+                                          brightness_lvl, sharpness_lvl, contrast_lvl, color_lvl)
+                            display_job_result(job, "Enhanced Image has been successfully generated.")
+
+                        elif select_output == "Apply Filter":
+                            display_msg("NOTE: The filter is applied to every frame, it may take a while.", 0)
+
+                            select_options = ["Pencil Sketch", "Water Colored", "Faded", "Document",
+                                             "Cartoonify", "Vigenette", "Phantom", "Negative"]
+                            select_filter = st.sidebar.selectbox("Select a filter:", select_options)
+
+                            job = run_job(f"{processor.get_digest()}_video_filter_{select_filter}", 
+                                          st.sidebar.button("Generate"), processor.filter_video, 
+                                          workspace.processed, filter=select_filter)
+                            display_job_result(job, "Filter has been successfully applied.")
+
+                        elif select_output == "Generate Shot":
+                            display_msg("NOTE: It may take a while to generate a shot.", 0)
+
+                            shot_options = ["SlowMo", "TimeLapse", "GIF", "Boomerang"]
+                            shot = st.sidebar.selectbox("Select Shot:", shot_options)
+
+                            if shot == "SlowMo":
+                                job = run_job(f"{processor.get_digest()}_slowmo", st.sidebar.button("Generate"),
+                                              processor.generate_shot, workspace.processed, slowmo=True)
+                                display_job_result(job, "SlowMo has been successfully generated.")
                         
-                        elif shot == "TimeLapse" and st.sidebar.button("Generate"):
-                            processor.generate_shot(PROCESSED_DATA_PATH, timelapse=True)
-                            display_progress_bar()
-                            display_msg("TimeLapse has been successfully generated.", 1)
+                            elif shot == "TimeLapse":
+                                job = run_job(f"{processor.get_digest()}_timelapse", st.sidebar.button("Generate"),
+                                              processor.generate_shot, workspace.processed, timelapse=True)
+                                display_job_result(job, "TimeLapse has been successfully generated.")
                         
-                        elif shot == "GIF" and st.sidebar.button("Generate"):
-                            processor.generate_shot(PROCESSED_DATA_PATH, gif=True)
-                            display_progress_bar()
-                            display_msg("GIF has been successfully generated.", 1)
+                            elif shot == "GIF":
+                                job = run_job(f"{processor.get_digest()}_gif", st.sidebar.button("Generate"),
+                                              processor.generate_shot, workspace.processed, gif=True)
+                                display_job_result(job, "GIF has been successfully generated.")
                         
-                        elif shot == "Boomerang":
-                            start_time = st.sidebar.slider("Choose the start time (in seconds):", 
-                                                    min_value=1, max_value=video_duration, 
-                                                    step=1)
-                            end_time = st.sidebar.slider("Choose the end time (in seconds):", 
-                                                    min_value=start_time + 2, max_value=video_duration, 
-                                                    step=1)
-
-                            if st.sidebar.button("Generate"):
-                                processor.generate_shot(PROCESSED_DATA_PATH, 
-                                                       boomerang=(True, start_time, end_time))
-                                display_progress_bar()
-                                display_msg("Boomerang has been successfully generated.", 1)
-
-                else:
-                    display_msg("Please select atleast a single option to proceed.", 0)
-
-        else:
-            if not os.path.isdir(PROCESSED_DATA_PATH):
-                os.mkdir(PROCESSED_DATA_PATH)
+                            elif shot == "Boomerang":
+                                start_time = st.sidebar.slider("Choose the start time (in seconds):", 
+                                                        min_value=1, max_value=video_duration, 
+                                                        step=1)
+                                end_time = st.sidebar.slider("Choose the end time (in seconds):", 
+                                                        min_value=start_time + 2, max_value=video_duration, 
+                                                        step=1)
+
+                                job = run_job(f"{processor.get_digest()}_boomerang_{start_time}_{end_time}", 
+                                              st.sidebar.button("Generate"), processor.generate_shot, 
+                                              workspace.processed, boomerang=(True, start_time, end_time))
+                                display_job_result(job, "Boomerang has been successfully generated.")
+
+                    else:
+                        display_msg("Please select atleast a single option to proceed.", 0)
 
-            select_options = ["Enhance Resolution", "Apply Filter", "Extract Text"]
-            select_output = st.sidebar.selectbox("Select Enhancement:", select_options)
-
-            if select_output:
-                time.sleep(1.5)
-                if select_output == "Enhance Resolution":
+            else:
+                select_options = ["Enhance Resolution", "Apply Filter", "Extract Text"]
+                select_output = st.sidebar.selectbox("Select Enhancement:", select_options)
 
-                    if st.sidebar.button("Generate"):
-                        display_msg("Please wait. It may take a while to enhance the resolution...", 0)
-                        processor.enhance_resolution(PROCESSED_DATA_PATH)
-                        display_progress_bar()
-                        display_msg("Enhanced Resolution Image has been successfully generated.", 1)
+                if select_output:
+                    if select_output == "Enhance Resolution":
+                        generate = st.sidebar.button("Generate")
+                        if generate:
+                            display_msg("Please wait. It may take a while to enhance the resolution...", 0)
+
+                        job = run_job(f"{processor.get_digest()}_enhance_resolution", generate,
+                                      processor.enhance_resolution, workspace.processed)
+                        display_job_result(job, "Enhanced Resolution Image has been successfully generated.")
                 
-                elif select_output == "Apply Filter":
-                    select_options = ["Pencil Sketch", "Water Colored", "Faded", "Document",
-                                     "Cartoonify", "Vigenette", "Phantom", "Negative"]
-                    select_output = st.sidebar.selectbox("Select a filter:", select_options)
-
-                    if st.sidebar.button("Generate"):
-                        processor.apply_filter(PROCESSED_DATA_PATH, filter=select_output)
-                        display_progress_bar()
-                        display_msg("Filter has been successfully applied.", 1)
-
-                elif select_output == "Extract Text":
-                    if st.sidebar.button("Fetch Text"):
-                        txt = processor.extract_txt()
+                    elif select_output == "Apply Filter":
+                        select_options = ["Pencil Sketch", "Water Colored", "Faded", "Document",
+                                         "Cartoonify", "Vigenette", "Phantom", "Negative"]
+                        select_output = st.sidebar.selectbox("Select a filter:", select_options)
+                        display_preview(processor.preview_filter, filter=select_output)
+
+                        job = run_job(f"{processor.get_digest()}_filter_{select_output}", 
+                                      st.sidebar.button("Generate"), processor.apply_filter, 
+                                      workspace.processed, filter=select_output)
+                        display_job_result(job, "Filter has been successfully applied.")
+
+                    elif select_output == "Extract Text":
+                        job = run_job(f"{processor.get_digest()}_extract_txt", 
+                                      st.sidebar.button("Fetch Text"), processor.extract_txt)
+
+                        if job is not None and job.status == DONE:
+                            txt = job.result
                     
-                        if txt:
-                            display_msg("Text extraction successful.", 1)
-                            text_expander = st.beta_expander("Output Section")
-                            with text_expander:
-                                st.text("*" * 70)
-                                st.write(txt)
-                                st.text("*" * 70)
+                            if txt:
+                                display_msg("Text extraction successful.", 1)
+                                text_expander = st.beta_expander("Output Section")
+                                with text_expander:
+                                    st.text("*" * 70)
+                                    st.write(txt)
+                                    st.text("*" * 70)
+                            else:
+                                display_msg("Failed to extract text!", -1)
                         else:
-                            display_msg("Failed to extract text!", -1)
+                            display_job_result(job, "Text extraction successful.")
 
-            else:
-                display_msg("Please select atleast a single option to proceed.", 0)
+                else:
+                    display_msg("Please select atleast a single option to proceed.", 0)
 
-        file_data.close() # Delete the temp file after all the operations.
-        shutil.rmtree("./temp_files") 
+            file_data.close() # The upload itself is removed along with the workspace
 
-        helper_widget = st.empty()
-        processed_files = os.listdir(PROCESSED_DATA_PATH)
+            helper_widget = st.empty()
+            processed_files = os.listdir(workspace.processed)
 
-        if processed_files:
-            if helper_widget.button("Proceed to Download"):
-                    display_processed_file(PROCESSED_DATA_PATH, processed_files)
+            if processed_files:
+                if helper_widget.button("Proceed to Download"):
+                        display_processed_file(workspace, processed_files)
 
     display_info_sections()
 
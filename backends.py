@@ -0,0 +1,44 @@
+# Required Imports
+import importlib
+import threading
+
+# Heavy or optional backends, imported on first use: name -> (module, install hint)
+BACKENDS = {
+    "pytesseract": ("pytesseract", "pip install pytesseract"),
+    "dnn_superres": ("cv2.dnn_superres", "pip install opencv-contrib-python"),
+}
+
+# BackendRegistry class for importing backends lazily
+class BackendRegistry:
+    def __init__(self, backends):
+        self.__backends = backends
+        self.__modules = {} # Imported backends, by name
+        self.__lock = threading.Lock()
+
+    def get(self, name):
+        ''' Get the module of the named backend,
+        importing it the first time it is needed '''
+        module = self.__modules.get(name)
+        if module is not None:
+            return module
+
+        try:
+            module_name, install_hint = self.__backends[name]
+        except KeyError:
+            raise ValueError(f"Unknown backend: {name}")
+
+        with self.__lock:
+            if name not in self.__modules:
+                try:
+                    self.__modules[name] = importlib.import_module(module_name)
+                except ImportError as error:
+                    raise ImportError(f"The {name} backend is not available ({install_hint})") from error
+
+            return self.__modules[name]
+
+    def loaded(self):
+        ''' Names of the backends imported so far '''
+        return sorted(self.__modules)
+
+# Registry shared by the whole process
+BACKEND_REGISTRY = BackendRegistry(BACKENDS)
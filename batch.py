@@ -0,0 +1,140 @@
+# Required Imports
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from file_processing import FileProcessor
+
+SUPPORTED_EXTENSIONS = (".mp4", ".avi", ".mov", ".jpeg", ".jpg", ".png")
+
+# Operations available in batch mode, mapped to FileProcessor methods
+OPERATIONS = {
+    "enhanced_img": "enhanced_img",
+    "enhance_resolution": "enhance_resolution",
+    "filter": "apply_filter",
+    "video_filter": "filter_video",
+    "shot": "generate_shot",
+    "extract_txt": "extract_txt",
+}
+
+# A single file to process and the outcome of processing it
+Job = namedtuple("Job", ["file", "operation", "params"])
+JobResult = namedtuple("JobResult", ["file", "operation", "params", "output_path", "seconds", "error"])
+
+# Helper Functions
+def load_jobs(source, operation=None, params=None):
+    ''' Build the list of jobs from a directory of
+    files (all getting the same operation) or from
+    a JSON manifest of the form
+    [{"file": ..., "operation": ..., "params": {...}}, ...] '''
+    if os.path.isdir(source):
+        if operation is None:
+            raise ValueError("An operation is required when processing a directory")
+
+        return [Job(os.path.join(source, name), operation, params or {})
+                for name in sorted(os.listdir(source))
+                if name.lower().endswith(SUPPORTED_EXTENSIONS)]
+
+    with open(source) as manifest:
+        entries = json.load(manifest)
+
+    base_dir = os.path.dirname(os.path.abspath(source)) # Files are relative to the manifest
+    return [Job(os.path.join(base_dir, entry["file"]), entry["operation"],
+                entry.get("params", {})) for entry in entries]
+
+def run_job(job, output_dir, index=0):
+    ''' Process a single job, writing its outputs to
+    a directory of its own inside output_dir, named
+    after its index in the batch, file and operation '''
+    if job.operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {job.operation}")
+
+    # The index tells apart jobs on the same file (or on files of the same
+    # name in different directories) with the same operation
+    job_name = os.path.basename(job.file).replace(".", "_")
+    output_path = os.path.join(output_dir, f"{index:04d}_{job_name}_{job.operation}")
+    os.makedirs(output_path, exist_ok=True)
+
+    with open(job.file, "rb") as file:
+        processor = FileProcessor(file)
+        method = getattr(processor, OPERATIONS[job.operation])
+
+        if job.operation == "extract_txt":
+            txt = method(**job.params)
+            with open(os.path.join(output_path, "text.txt"), "w") as txt_file:
+                txt_file.write(txt or "")
+        else:
+            method(output_path, **job.params)
+
+    return output_path
+
+def timed_job(job, output_dir, index=0):
+    ''' Run the job in a worker process and
+    report how long it took and whether it failed '''
+    start = time.perf_counter()
+    output_path, error = None, None
+    try:
+        output_path = run_job(job, output_dir, index)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+
+    return JobResult(job.file, job.operation, job.params, output_path,
+                     time.perf_counter() - start, error)
+
+def process_batch(jobs, output_dir, workers=None):
+    ''' Fan the jobs out over a process pool and
+    yield their results as they complete '''
+    os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(timed_job, job, output_dir, index)
+                   for index, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+def parse_param(param):
+    ''' Parse a key=value command line parameter.
+    Values are read as JSON when possible '''
+    key, _, value = param.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+# Main CLI
+def main(argv=None):
+    ''' Headless batch processing of files '''
+    parser = argparse.ArgumentParser(description="Process a batch of files with MonoShot")
+    parser.add_argument("source", help="Directory of files or JSON manifest of jobs")
+    parser.add_argument("output_dir", help="Directory to write the outputs to")
+    parser.add_argument("--operation", choices=sorted(OPERATIONS),
+                        help="Operation applied to every file of a directory")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help='Operation parameter, e.g. --param filter="Pencil Sketch"')
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.source, args.operation, dict(map(parse_param, args.param)))
+    start = time.perf_counter()
+    results = []
+
+    for result in process_batch(jobs, args.output_dir, args.workers):
+        results.append(result)
+        status = f"FAILED ({result.error})" if result.error else "OK"
+        print(f"[{len(results)}/{len(jobs)}] {result.file} {result.operation}: "
+              f"{status} in {result.seconds:.2f}s", flush=True)
+
+    failures = [result for result in results if result.error]
+    with open(os.path.join(args.output_dir, "report.json"), "w") as report:
+        json.dump([result._asdict() for result in results], report, indent=2)
+
+    print(f"Processed {len(results)} jobs in {time.perf_counter() - start:.2f}s, "
+          f"{len(failures)} failed.")
+
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+# Required Imports
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+from PIL import Image, ImageEnhance # pip install pillow
+from enhancement import enhance
+
+# Synthetic media sizes (width, height)
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+VIDEO_SECONDS, VIDEO_FPS = 4, 30
+
+FILTERS = ["Pencil Sketch", "Water Colored", "Faded", "Document",
+           "Cartoonify", "Vigenette", "Phantom", "Negative"]
+SHOTS = {
+    "slowmo": {"slowmo": True},
+    "timelapse": {"timelapse": True},
+    "gif": {"gif": True},
+    "boomerang": {"boomerang": (True, 1, 3)},
+}
+
+# Largest difference (in levels) allowed between
+# the enhancement kernel and PIL, which it matches exactly
+PARITY_TOLERANCE = 0
+
+# Modules whose cold import time is benchmarked and the backends
+# they must leave to be imported on first use
+IMPORT_MODULES = ["file_processing", "batch"]
+LAZY_MODULES = ["pytesseract"]
+
+# Timing code run in a fresh interpreter for every import
+IMPORT_SNIPPET = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": seconds, "peak": peak,
+                  "eager": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+# A single benchmarked operation: FileProcessor method, its arguments
+# and the amount of work (megapixels or frames) done per run
+Case = namedtuple("Case", ["name", "media", "method", "args", "kwargs", "units", "unit_name"])
+
+# Helper Functions
+def synthetic_img(width, height, seed=0):
+    ''' Generate a reproducible RGB test image
+    (smooth gradients with some noise on top) '''
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.dstack([x + 0 * y, y + 0 * x, (x + y) / 2])
+    img += rng.normal(0, 20, img.shape).astype(np.float32)
+
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def synthetic_document(width, height):
+    ''' Generate an image of black text lines
+    on a white page '''
+    img = np.full((height, width, 3), 255, np.uint8)
+    scale = height / 720
+    line_height = int(40 * scale)
+
+    for line, y in enumerate(range(line_height * 2, height - line_height, line_height)):
+        cv2.putText(img, f"Line {line}: the quick brown fox jumps over the lazy dog",
+                    (line_height, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0),
+                    max(int(2 * scale), 1))
+
+    return img
+
+def write_synthetic_video(path, width, height):
+    ''' Write a reproducible test video of a
+    gradient moving across the frame '''
+    output = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, (width, height))
+    base = synthetic_img(width, height)
+    for frame_no in range(VIDEO_SECONDS * VIDEO_FPS):
+        output.write(np.roll(base, frame_no * 8, axis=1))
+    output.release()
+
+def make_media(media_dir, resolution):
+    ''' Write the synthetic image, document and
+    video of a resolution to the media directory '''
+    width, height = RESOLUTIONS[resolution]
+    media = {
+        "image": os.path.join(media_dir, f"image_{resolution}.png"),
+        "document": os.path.join(media_dir, f"document_{resolution}.png"),
+        "video": os.path.join(media_dir, f"video_{resolution}.mp4"),
+    }
+
+    cv2.imwrite(media["image"], synthetic_img(width, height))
+    cv2.imwrite(media["document"], synthetic_document(width, height))
+    write_synthetic_video(media["video"], width, height)
+
+    return media
+
+def build_cases(resolution):
+    ''' All the FileProcessor operations to
+    benchmark at a resolution '''
+    width, height = RESOLUTIONS[resolution]
+    megapixels = width * height / 1e6
+    frames = VIDEO_SECONDS * VIDEO_FPS
+
+    cases = [Case(f"{resolution}/filter/{name}", "image", "apply_filter", (), {"filter": name},
+                  megapixels, "MP") for name in FILTERS]
+    cases.append(Case(f"{resolution}/enhance_resolution", "image", "enhance_resolution",
+                      (), {}, megapixels, "MP"))
+    cases.append(Case(f"{resolution}/extract_txt", "document", "extract_txt",
+                      (), {}, megapixels, "MP"))
+    cases.append(Case(f"{resolution}/enhanced_img", "video", "enhanced_img",
+                      (1000, 1.2, 1.4, 0.8, 1.2), {}, megapixels, "MP"))
+    cases += [Case(f"{resolution}/shot/{name}", "video", "generate_shot", (), kwargs,
+                   frames, "frames") for name, kwargs in SHOTS.items()]
+    cases += [Case(f"{resolution}/video_filter/{name}", "video", "filter_video", (), 
+                   {"filter": name}, frames, "frames") for name in FILTERS]
+
+    return cases
+
+def percentile(values, pct):
+    ''' Linearly interpolated percentile of the values '''
+    values = sorted(values)
+    position = (len(values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def peak_rss_mb():
+    ''' Peak resident memory of this process in MB '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3 # Bytes on macOS, KB elsewhere
+
+def run_case(case, media_path, repeat):
+    ''' Time a case in a fresh process, so that
+    its peak memory is its own. The first run is
+    a warm up and is not counted '''
+    from file_processing import FileProcessor
+    from result_cache import RESULT_CACHE
+    from admission import ADMISSION_CONTROLLER
+    RESULT_CACHE.enabled = False # Every run must do the actual work
+    ADMISSION_CONTROLLER.enabled = False # at full size, whatever the worker's budgets
+
+    timings = []
+    with open(media_path, "rb") as file, tempfile.TemporaryDirectory() as output_path:
+        processor = FileProcessor(file)
+        method = getattr(processor, case.method)
+
+        for run in range(repeat + 1):
+            start = time.perf_counter()
+            if case.method == "extract_txt":
+                method(*case.args, **case.kwargs)
+            else:
+                method(output_path, *case.args, **case.kwargs)
+            if run:
+                timings.append(time.perf_counter() - start)
+
+    p50 = percentile(timings, 50)
+    return {
+        "p50_s": round(p50, 6),
+        "p95_s": round(percentile(timings, 95), 6),
+        "throughput": round(case.units / p50, 3),
+        "throughput_unit": f"{case.unit_name}/s",
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "runs": len(timings),
+    }
+
+def run_suite(resolutions, repeat, only=None):
+    ''' Generate the synthetic media and benchmark
+    every case, one process per case '''
+    results = {}
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as media_dir:
+        for resolution in resolutions:
+            media = make_media(media_dir, resolution)
+
+            for case in build_cases(resolution):
+                if only and not any(pattern in case.name for pattern in only):
+                    continue
+
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    try:
+                        result = executor.submit(run_case, case, media[case.media], repeat).result()
+                    except Exception as error:
+                        result = {"error": f"{type(error).__name__}: {error}"}
+
+                results[case.name] = result
+                print(format_result(case.name, result), flush=True)
+
+    return results
+
+def format_result(name, result):
+    ''' One line summary of a benchmark result '''
+    if "error" in result:
+        return f"{name:<40} FAILED ({result['error']})"
+
+    return (f"{name:<40} p50 {result['p50_s'] * 1000:9.1f} ms  "
+            f"p95 {result['p95_s'] * 1000:9.1f} ms  "
+            f"{result['throughput']:9.2f} {result['throughput_unit']:<9} "
+            f"peak RSS {result['peak_rss_mb']:7.1f} MB")
+
+def compare_to_baseline(results, baseline, threshold):
+    ''' Print the p50 change of every case against the
+    baseline. Returns the names of regressed cases '''
+    regressions = []
+    print(f"\nComparison against baseline (regression threshold {threshold:.0%}):")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or "error" in previous or "error" in result:
+            continue
+
+        change = result["p50_s"] / previous["p50_s"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40} {previous['p50_s'] * 1000:9.1f} ms -> "
+              f"{result['p50_s'] * 1000:9.1f} ms ({change:+.1%}) {flag}")
+
+    return regressions
+
+def time_import(module):
+    ''' Import the module in a fresh interpreter. Returns
+    the seconds it took, its peak memory and the lazy
+    backends it imported along with it '''
+    code = IMPORT_SNIPPET.format(module=module, lazy=LAZY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    run = json.loads(output.decode().strip().splitlines()[-1])
+    run["peak_rss_mb"] = run["peak"] / 1e6 if sys.platform == "darwin" else run["peak"] / 1e3
+
+    return run
+
+def benchmark_imports(repeat):
+    ''' Time the cold import of every module. The first
+    import (compiling the sources) is a warm up and is not
+    counted. Modules importing a lazy backend fail '''
+    results = {}
+    for module in IMPORT_MODULES:
+        runs = [time_import(module) for _ in range(repeat + 1)][1:]
+        eager = sorted({name for run in runs for name in run["eager"]})
+        timings = [run["seconds"] for run in runs]
+
+        if eager:
+            result = {"error": f"eagerly imports {', '.join(eager)}"}
+        else:
+            p50 = percentile(timings, 50)
+            result = {
+                "p50_s": round(p50, 6),
+                "p95_s": round(percentile(timings, 95), 6),
+                "throughput": round(1 / p50, 3),
+                "throughput_unit": "imports/s",
+                "peak_rss_mb": round(max(run["peak_rss_mb"] for run in runs), 1),
+                "runs": len(timings),
+            }
+
+        results[f"import/{module}"] = result
+        print(format_result(f"import/{module}", result), flush=True)
+
+    return results
+
+def pil_enhance(img, brightness, sharpness, contrast, color):
+    ''' Reference enhancement chaining PIL's
+    ImageEnhance operations one by one '''
+    pil_img = Image.fromarray(img)
+    pil_img = ImageEnhance.Brightness(pil_img).enhance(brightness)
+    pil_img = ImageEnhance.Sharpness(pil_img).enhance(sharpness)
+    pil_img = ImageEnhance.Contrast(pil_img).enhance(contrast)
+    pil_img = ImageEnhance.Color(pil_img).enhance(color)
+
+    return np.asarray(pil_img)
+
+def time_it(func, repeat=5):
+    ''' Best wall clock time of the function in seconds '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+def benchmark_enhancement(width=1920, height=1080, tolerance=PARITY_TOLERANCE):
+    ''' Compare the enhancement kernel against
+    the PIL ImageEnhance chain, both for speed and for
+    parity. Returns False if any result differs from
+    PIL's by more than `tolerance` levels '''
+    img = synthetic_img(width, height)
+    LEVELS = [
+        (1.4, 1.0, 1.0, 1.0), # Brightness only (LUT path)
+        (1.2, 1.0, 0.8, 1.0), # Brightness and contrast (LUT path)
+        (2.0, 1.0, 0.4, 1.0), # Heavy clipping before contrast (LUT path)
+        (1.2, 1.6, 0.8, 1.4), # All four adjustments
+        (2.0, 2.0, 2.0, 2.0), # All four at the maximum of the sliders
+        (0.4, 0.0, 1.6, 0.0), # Darker, blurred and grayscale
+    ]
+
+    matches = True
+    print(f"Enhancement {width}x{height}:")
+    for levels in LEVELS:
+        pil_time = time_it(lambda: pil_enhance(img, *levels))
+        kernel_time = time_it(lambda: enhance(img, *levels))
+        max_diff = np.abs(pil_enhance(img, *levels).astype(np.int16) -
+                          enhance(img, *levels).astype(np.int16)).max()
+        status = "OK" if max_diff <= tolerance else "MISMATCH"
+        matches = matches and max_diff <= tolerance
+
+        print(f"  levels={levels}: PIL {pil_time * 1000:.1f} ms, "
+              f"kernel {kernel_time * 1000:.1f} ms "
+              f"({pil_time / kernel_time:.1f}x), max diff {max_diff} {status}")
+
+    return matches
+
+# Main CLI
+def main(argv=None):
+    ''' Benchmark all FileProcessor operations
+    on synthetic media '''
+    parser = argparse.ArgumentParser(description="Benchmark MonoShot operations on synthetic media")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS),
+                        default=list(RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--only", nargs="+", metavar="PATTERN",
+                        help="Only run cases whose name contains one of the patterns")
+    parser.add_argument("--save", metavar="JSON", help="Save the results as a baseline")
+    parser.add_argument("--baseline", metavar="JSON", help="Compare the results to a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative p50 slowdown reported as a regression")
+    parser.add_argument("--kernels", action="store_true",
+                        help="Only compare the enhancement kernel with PIL (speed and parity)")
+    parser.add_argument("--imports", action="store_true",
+                        help="Only benchmark the cold import time of the modules")
+    args = parser.parse_args(argv)
+
+    if args.kernels: # Exits with 1 if the kernel does not match PIL
+        return 0 if benchmark_enhancement() else 1
+
+    if args.imports:
+        results = benchmark_imports(args.repeat)
+        if any("error" in result for result in results.values()):
+            return 1
+    else:
+        results = run_suite(args.resolutions, args.repeat, args.only)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare_to_baseline(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# Required Imports
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+
+# Codecs tried for OpenCV's VideoWriter, most preferred (browser playable) first
+CANDIDATE_FOURCCS = ["avc1", "H264", "X264", "mp4v"]
+BROWSER_PLAYABLE_FOURCCS = {"avc1", "H264", "X264"}
+
+# Encoder backend: "opencv", "ffmpeg" or "auto" (picked when probing)
+ENCODER_BACKEND = os.environ.get("MONOSHOT_VIDEO_ENCODER", "auto")
+FFMPEG_PRESET = os.environ.get("MONOSHOT_FFMPEG_PRESET", "veryfast")
+FFMPEG_CRF = int(os.environ.get("MONOSHOT_FFMPEG_CRF", "23"))
+
+# Helper Functions
+def choose_output_size(width, height, max_long_side=1280, max_short_side=720):
+    ''' Output size fitting the video within 1280x720
+    (720x1280 for portrait videos) keeping its aspect
+    ratio. Videos are never upscaled. Both sides are even,
+    as required by most encoders '''
+    if width >= height:
+        scale = min(max_long_side / width, max_short_side / height, 1.0)
+    else:
+        scale = min(max_short_side / width, max_long_side / height, 1.0)
+
+    return int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
+
+def choose_interpolation(src_size, dst_size):
+    ''' INTER_AREA for downscaling (no aliasing and
+    faster), INTER_CUBIC for upscaling and None if
+    the size does not change '''
+    if tuple(src_size) == tuple(dst_size):
+        return None
+    if dst_size[0] <= src_size[0] and dst_size[1] <= src_size[1]:
+        return cv2.INTER_AREA
+
+    return cv2.INTER_CUBIC
+
+def make_resize(src_size, dst_size):
+    ''' Frame transform resizing from src_size
+    to dst_size (width, height) '''
+    interpolation = choose_interpolation(src_size, dst_size)
+    if interpolation is None:
+        return lambda frame: frame
+
+    return lambda frame: cv2.resize(frame, tuple(dst_size), interpolation=interpolation)
+
+def probe_fourcc(candidates=CANDIDATE_FOURCCS):
+    ''' First codec OpenCV can actually write with on
+    this machine (tested by writing a tiny video) '''
+    frame = np.zeros((64, 64, 3), np.uint8)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for fourcc in candidates:
+            path = os.path.join(temp_dir, f"probe_{fourcc}.mp4")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 10, (64, 64))
+            try:
+                if not writer.isOpened():
+                    continue
+                writer.write(frame)
+            finally:
+                writer.release()
+
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                return fourcc
+
+    return None
+
+# OpenCVWriter class for writing videos through cv2.VideoWriter
+class OpenCVWriter:
+    def __init__(self, output_file, fourcc, fps, size):
+        self.__writer = cv2.VideoWriter(output_file, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not self.__writer.isOpened():
+            raise RuntimeError(f"Could not open a {fourcc} video writer for {output_file}")
+
+    def write(self, frame):
+        self.__writer.write(frame)
+
+    def release(self):
+        self.__writer.release()
+
+# FFmpegWriter class for writing videos by piping raw frames to ffmpeg
+class FFmpegWriter:
+    def __init__(self, output_file, fps, size, preset=FFMPEG_PRESET, crf=FFMPEG_CRF):
+        width, height = size
+        command = [
+            shutil.which("ffmpeg") or "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+            "-r", str(fps), "-i", "-",
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", # yuv420p needs even sides
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart", output_file,
+        ]
+        self.__process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                          stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        self.__process.stdin.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        self.__process.stdin.close()
+        error = self.__process.stderr.read()
+        if self.__process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {error.decode(errors='replace').strip()}")
+
+# VideoEncoder class for picking (once) and opening the video writer to use
+class VideoEncoder:
+    def __init__(self, backend=ENCODER_BACKEND, preset=FFMPEG_PRESET, crf=FFMPEG_CRF):
+        self.backend = backend
+        self.preset = preset
+        self.crf = crf
+        self.__selected = None # (backend, fourcc) once probed
+        self.__lock = threading.Lock()
+
+    def select(self):
+        ''' Probe the available encoders (only the first
+        time) and return the chosen (backend, fourcc).
+        OpenCV is used when it can write browser playable
+        H.264, ffmpeg otherwise (if installed) '''
+        with self.__lock:
+            if self.__selected is None:
+                fourcc = probe_fourcc() if self.backend != "ffmpeg" else None
+                has_ffmpeg = shutil.which("ffmpeg") is not None
+
+                if self.backend == "ffmpeg" or (self.backend == "auto" and has_ffmpeg 
+                                                and fourcc not in BROWSER_PLAYABLE_FOURCCS):
+                    self.__selected = ("ffmpeg", None)
+                elif fourcc is not None:
+                    self.__selected = ("opencv", fourcc)
+                else:
+                    raise RuntimeError("No usable video encoder found, please install ffmpeg")
+
+            return self.__selected
+
+    def open_writer(self, output_file, fps, size):
+        ''' Open a writer for an .mp4 video of the given
+        fps and size (width, height) with the chosen encoder '''
+        backend, fourcc = self.select()
+        if backend == "ffmpeg":
+            return FFmpegWriter(output_file, fps, size, self.preset, self.crf)
+
+        return OpenCVWriter(output_file, fourcc, fps, size)
+
+# Encoder shared by the whole process
+VIDEO_ENCODER = VideoEncoder()
@@ -0,0 +1,73 @@
+# Required Imports
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+from PIL import Image, ImageEnhance # pip install pillow
+
+# Kernel of PIL's ImageFilter.SMOOTH, used by ImageEnhance.Sharpness
+SMOOTH_KERNEL = np.array([[1, 1, 1],
+                          [1, 5, 1],
+                          [1, 1, 1]], np.float32) / 13
+
+# Helper Functions
+def blend_lut(factor, degenerate=0):
+    ''' Lookup table of PIL's Image.blend of every pixel
+    value with a constant (degenerate) value. Computed in
+    single precision, clipped and truncated like PIL '''
+    values = np.arange(256, dtype=np.float32)
+    blended = degenerate + np.float32(factor) * (values - degenerate)
+
+    return np.clip(blended, 0, 255).astype(np.uint8)
+
+def gray_mean(pil_img):
+    ''' Mean of the grayscale ("L") version of the
+    image, rounded like ImageEnhance.Contrast does '''
+    gray = pil_img if pil_img.mode == "L" else pil_img.convert("L")
+    total = sum(value * count for value, count in enumerate(gray.histogram()))
+
+    return int(total / (gray.width * gray.height) + 0.5)
+
+def smooth(img):
+    ''' PIL's SMOOTH filter (the outermost pixels are left
+    unfiltered). OpenCV gives the same pixels, as the
+    weighted sums never fall halfway between two levels '''
+    smoothed = cv2.filter2D(img, -1, SMOOTH_KERNEL, borderType=cv2.BORDER_REPLICATE)
+    smoothed[[0, -1]] = img[[0, -1]]
+    smoothed[:, [0, -1]] = img[:, [0, -1]]
+
+    return smoothed
+
+def enhance(img, brightness=1.0, sharpness=1.0, contrast=1.0, color=1.0, bgr=False):
+    ''' Apply brightness, sharpness, contrast and color
+    adjustments. The result is the same as chaining PIL's
+    ImageEnhance Brightness, Sharpness, Contrast and Color.
+    Brightness and contrast are lookup tables, which is
+    many times faster than PIL. Sharpness only saves PIL's
+    slow SMOOTH filter and color is left to PIL, as every
+    step truncates its result before the next one and a
+    single pass cannot match that. Set bgr for OpenCV frames,
+    e.g. when enhancing every frame of a video '''
+    bgr = bgr and img.ndim == 3
+    work = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if bgr else img
+
+    if brightness != 1.0:
+        work = cv2.LUT(work, blend_lut(brightness))
+
+    if sharpness == 1.0 and (color == 1.0 or img.ndim == 2):
+        # Brightness and contrast alone map every pixel value independently
+        if contrast != 1.0:
+            work = cv2.LUT(work, blend_lut(contrast, gray_mean(Image.fromarray(work))))
+    else:
+        pil_img = Image.fromarray(work)
+        if sharpness != 1.0:
+            pil_img = Image.blend(Image.fromarray(smooth(work)), pil_img, sharpness)
+        if contrast != 1.0:
+            lut = blend_lut(contrast, gray_mean(pil_img)).tolist()
+            pil_img = pil_img.point(lut * len(pil_img.getbands()))
+        if color != 1.0 and img.ndim == 3:
+            pil_img = ImageEnhance.Color(pil_img).enhance(color)
+        work = np.array(pil_img)
+
+    if bgr:
+        return cv2.cvtColor(work, cv2.COLOR_RGB2BGR)
+
+    return work if work is not img else img.copy()
@@ -1,260 +1,374 @@
 # Required Imports
+import os
+from collections import namedtuple
 import cv2 # pip install opencv-python
-from cv2 import dnn_superres # pip install opencv-contrib-python
-from moviepy.editor import * # pip install moviepy
-import moviepy.video.fx.all as vfx
-from PIL import Image, ImageEnhance # pip install pillow
-import numpy as np # pip install numpy
-import pytesseract as pyt # pip install pytesseract
+from PIL import Image # pip install pillow
+from super_resolution import upsample_tiled
+from frame_pipeline import FramePipeline, read_frames, read_frames_at
+from result_cache import cached, file_digest
+from enhancement import enhance
+from ocr import ocr_regions, preprocess_page
+from metrics import instrumented
+from admission import admitted
+from filters import FILTERS, make_filter
+from gif_encoder import build_palette, quantize_frame, sample_frames, write_gif
+from encoders import VIDEO_ENCODER, choose_output_size, make_resize
+from image_encoder import IMAGE_FORMATS, encode_image, to_pil
+from previews import frame_proxy, image_proxy, normalize_frame, read_frame
+
+# Basic details of a video file
+VideoMetadata = namedtuple("VideoMetadata", 
+                          ["duration", "fps", "frame_count", "width", "height", "codec"])
 
 # VideoProcessor class for all processing related methods
 class FileProcessor:
-    def __init__(self, file):
+    def __init__(self, file, digest=None):
         self.__file = file.name # Fetch the location of the file for processing
+        self.__digest = digest # Content hash, if already known
+        self.__metadata = None
     
+    def get_digest(self):
+        ''' Get the content hash of the file
+        (computed once) for caching results '''
+        if self.__digest is None:
+            self.__digest = file_digest(self.__file)
+
+        return self.__digest
+    
+    def get_metadata(self):
+        ''' Probe the video file once and get its 
+        basic details. The result is remembered for 
+        the lifetime of the processor '''
+        if self.__metadata is None:
+            video = cv2.VideoCapture(self.__file)
+            try:
+                fps = video.get(cv2.CAP_PROP_FPS)
+                frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+                fourcc = int(video.get(cv2.CAP_PROP_FOURCC))
+
+                self.__metadata = VideoMetadata(
+                    duration=frame_count / fps if fps > 0 else 0.0, # Some containers report 0 fps
+                    fps=fps,
+                    frame_count=frame_count,
+                    width=int(video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    height=int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    codec="".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip("\x00")
+                )
+            finally:
+                video.release()
+
+        return self.__metadata
+
+    def get_image_size(self):
+        ''' Get the (width, height) of the image file
+        (only its header is read) '''
+        with Image.open(self.__file) as img:
+            return img.size
+
     def get_duration(self):
         ''' Get the duration of video file in 
             seconds '''
-        video = cv2.VideoCapture(self.__file)
-        frames = video.get(cv2.CAP_PROP_FRAME_COUNT) 
-        fps = int(video.get(cv2.CAP_PROP_FPS)) 
-        duration = int(frames / fps)
-
-        return duration
+        return int(self.get_metadata().duration)
 
     def get_dimensions(self):
         ''' Get the dimesnions of file '''
-        file = cv2.VideoCapture(self.__file)
-        width, height = file.get(3), file.get(4)
+        metadata = self.get_metadata()
+        width, height = metadata.width, metadata.height
 
         # Return true if the file uploaded has dimensions btw 480p and 1080p
-        return (int(width) in range(640, 1921) and int(height) in range(360, 1081)) \
-               or (int(height) in range(640, 1921) and int(width) in range(360, 1081))
+        return (width in range(640, 1921) and height in range(360, 1081)) \
+               or (height in range(640, 1921) and width in range(360, 1081))
+
+    def reduce_img_size(self, img, output_path, output_filename, as_bytes=False, 
+                        image_format="PNG", compression="balanced", bgr=False):
+        ''' Reduces img file size, fitting it within 1280x720
+        keeping its aspect ratio. Returns the encoded image 
+        instead of saving it if as_bytes is True, otherwise
+        the name of the saved file (relative to output_path,
+        so that results can be cached for any directory) '''
+        encoded = encode_image(img, image_format, compression, bgr=bgr)
+        if as_bytes:
+            return encoded
+
+        filename = f"{output_filename}.{IMAGE_FORMATS[image_format.upper()]}"
+        with open(os.path.join(output_path, filename), "wb") as img_file:
+            img_file.write(encoded)
+
+        return filename
+
+    def __read_img(self, flags=cv2.IMREAD_COLOR, scale=1.0):
+        ''' Decode the image file, downscaled by `scale` '''
+        img = cv2.imread(self.__file, flags)
+        if scale < 1.0:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        return img
+
+    def __write_video(self, output_file, transform, fps, size, step=1, 
+                      progress=None, metrics=None):
+        ''' Write every `step`th frame of the video through
+        the transform into a new video. Frames are transformed 
+        on worker threads while decoding and encoding carry on '''
+        total_frames = max(self.get_metadata().frame_count // step, 1)
+        written_frames = 0
+
+        output = VIDEO_ENCODER.open_writer(output_file, fps, size)
+        video = cv2.VideoCapture(self.__file)
 
-    def reduce_img_size(self, img, output_path, output_filename):
-        ''' Reduces img file size '''
-        WIDTH, HEIGHT = 1280, 720
+        def write(frame):
+            nonlocal written_frames
+            with metrics.stage("encode"):
+                output.write(frame)
+            written_frames += 1
+            metrics.count("frames")
+            if progress:
+                progress(written_frames / total_frames)
+
+        pipeline = FramePipeline(transform)
         try:
-            pil_img = Image.fromarray(img)
-        except:
-            resized_img = img.resize((WIDTH, HEIGHT), Image.ANTIALIAS)
-            resized_img.save(f"./{output_path}/{output_filename}.png", optimize=True,
-                            quality=95)
-        else:
-            resized_img = pil_img.resize((WIDTH, HEIGHT), Image.ANTIALIAS)
-            resized_img.save(f"./{output_path}/{output_filename}.png", optimize=True,
-                            quality=95)
-        
+            pipeline.run(metrics.timed_iter(read_frames(video, step), "decode"), write)
+        finally:
+            video.release()
+            with metrics.stage("encode"):
+                output.release()
+
+    @instrumented("shot")
+    @cached("shot")
+    @admitted("shot", video=True)
     def generate_shot(self, output_path, slowmo=False, 
                        timelapse=False, gif=False, 
-                       boomerang=(False, None, None)):
+                       boomerang=(False, None, None),
+                       timelapse_speed=10, timelapse_fps=30, gif_fps=10, 
+                       progress=None, metrics=None):
         ''' Generates specified shot of the 
-        video file '''
+        video file. A timelapse keeps every 
+        `timelapse_speed`th frame and plays 
+        them at `timelapse_fps`. A GIF keeps
+        about `gif_fps` frames per second '''
         if slowmo or timelapse:
-            video = cv2.VideoCapture(self.__file)
-            FW, FH = 1280, 720
-            FOUR_CC = cv2.VideoWriter_fourcc(*"AVC1")
+            metadata = self.get_metadata()
+            size = choose_output_size(metadata.width, metadata.height) # At most 1280x720
 
             if slowmo:
-                FPS = 5.5
-                output = cv2.VideoWriter(f"./{output_path}/slow_motion.mp4", FOUR_CC, FPS, (FW, FH))
-                while video.isOpened():
-                    ret, frame = video.read()
-                    if not ret:
-                        break
-
-                    resized = cv2.resize(frame, (FW,FH), fx=0, fy=0, 
-                                        interpolation=cv2.INTER_CUBIC)
-                    output.write(resized)
-
-            elif timelapse:
-                FPS = 30
-                count, speed = 0, 10
-                frames = []
-                output = cv2.VideoWriter(f"./{output_path}/timelapse.mp4", FOUR_CC, FPS, (FW, FH))
+                FPS, step, filename = 5.5, 1, "slow_motion.mp4"
+            else: # Keep every `timelapse_speed`th frame only
+                FPS, step, filename = timelapse_fps, timelapse_speed, "timelapse.mp4"
 
-                while video.isOpened():
-                    ret, frame = video.read()
-                    if not ret:
-                        break
-                    if count % speed == 0:
-                        resized = cv2.resize(frame, (FW,FH), fx=0, fy=0, 
-                                            interpolation=cv2.INTER_CUBIC)
-                        frames.append(resized)
+            resize = make_resize((metadata.width, metadata.height), size)
+            self.__write_video(os.path.join(output_path, filename), metrics.timed(resize, "resize"), 
+                               FPS, size, step, progress, metrics)
 
-                    count += 1
+        elif gif:
+            metadata = self.get_metadata()
+            source_fps = metadata.fps or 30
+            step = max(round(source_fps / gif_fps), 1) # Drop frames before resizing them
+            size = (int(metadata.width * 0.5), int(metadata.height * 0.5))
+            resize = lambda frame: cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
 
-                for frame in frames:
-                    output.write(frame)
-        
-            video.release()
-            output.release()
+            with metrics.stage("palette"):
+                palette = build_palette(sample_frames(self.__file, transform=resize))
 
-        elif gif:
-            video_file = VideoFileClip(self.__file).resize(0.5)
-            video_file.write_gif(f"./{output_path}/sample.gif")
+            total_frames = max(metadata.frame_count // step, 1)
+            frames = []
+
+            def collect(frame):
+                frames.append(frame)
+                metrics.count("frames")
+                if progress:
+                    progress(len(frames) / total_frames)
+
+            video = cv2.VideoCapture(self.__file)
+            pipeline = FramePipeline(metrics.timed(lambda frame: quantize_frame(resize(frame), palette), 
+                                                   "resize"))
+            try:
+                pipeline.run(metrics.timed_iter(read_frames(video, step), "decode"), collect)
+            finally:
+                video.release()
+
+            with metrics.stage("encode"):
+                write_gif(os.path.join(output_path, "sample.gif"), frames, 1000 * step / source_fps)
         
         elif boomerang[0]:
+            SPEED, FPS, SCALE = 4, 25, 0.7
             start, end = boomerang[1], boomerang[2]
-            video_file = VideoFileClip(self.__file).resize(0.7)
+            metadata = self.get_metadata()
+            source_fps = metadata.fps or 30
+            size = (int(metadata.width * SCALE), int(metadata.height * SCALE))
 
-            clip = video_file.subclip(start, end) # Get subclip from the video file
-            clip = clip.fx(vfx.crop, x1=115, x2=399, y1=0, y2=288)
-
-            speed_clip = clip.speedx(4)
-            reversed_speed_clip = speed_clip.fx(vfx.time_mirror)
-
-            final = concatenate_videoclips([speed_clip, reversed_speed_clip]) # Merge the clips
-            final.to_gif(f"./{output_path}/boomerang.gif", fps=25)
+            # Source frames shown when playing the subclip 4x faster at 25 fps
+            clip_frames = int((end - start) * source_fps)
+            indices = [round(frame_no * SPEED * source_fps / FPS) 
+                       for frame_no in range(int(clip_frames * FPS / (SPEED * source_fps)) + 1)]
 
+            video = cv2.VideoCapture(self.__file)
+            video.set(cv2.CAP_PROP_POS_MSEC, start * 1000) # Get subclip from the video file
+            try:
+                frames = []
+                for frame in metrics.timed_iter(read_frames_at(video, indices), "decode"):
+                    with metrics.stage("resize"):
+                        resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                        frames.append(resized[0:288, 115:399]) # Crop
+                    if progress:
+                        progress(len(frames) / len(indices))
+            finally:
+                video.release()
+
+            with metrics.stage("palette"):
+                palette = build_palette(frames[::max(len(frames) // 8, 1)])
+                forward = [quantize_frame(frame, palette) for frame in frames]
+            metrics.count("frames", 2 * len(forward))
+
+            # Play the same frames forward and then in reverse
+            with metrics.stage("encode"):
+                write_gif(os.path.join(output_path, "boomerang.gif"), 
+                          forward + forward[::-1], 1000 / FPS)
+
+    @instrumented("enhanced_img")
+    @cached("enhanced_img")
+    @admitted("enhanced_img", video=True)
     def enhanced_img(self, output_path, timestamp, brightness_lvl,
-                    sharpness_lvl, contrast_level, color_level):
+                    sharpness_lvl, contrast_level, color_level, as_bytes=False, 
+                    image_format="PNG", compression="balanced", progress=None, metrics=None):
         ''' Extar image from a specified
         video time stamp and generate an enhanced 
-        version of it'''
-        TEMP_IMG_PATH = "./temp_files/original_enhanced_img.png"
-        video = cv2.VideoCapture(self.__file)
-        video.set(cv2.CAP_PROP_POS_MSEC, timestamp)
-        video.set(3, 1920)
-        video.set(4, 1080)
-        _, frame = video.read()
-        cv2.imwrite(TEMP_IMG_PATH, frame)
-        video.release()
-
-        # Normalize image to reduce noise
-        img = cv2.imread(TEMP_IMG_PATH, cv2.IMREAD_UNCHANGED)
-        normalized_img = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX) 
-
-        # Apply final enhancements according to parameters
-        rgb_img = cv2.cvtColor(normalized_img, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(rgb_img)
-
-        if brightness_lvl != 1.0:
-            pil_img = ImageEnhance.Brightness(pil_img).enhance(brightness_lvl)
-        elif sharpness_lvl != 1.0:
-            pil_img = ImageEnhance.Sharpness(pil_img).enhance(sharpness_lvl)
-        elif contrast_level != 1.0:
-            pil_img = ImageEnhance.Contrast(pil_img).enhance(contrast_level)
-        elif color_level != 1.0:
-            pil_img = ImageEnhance.Color(pil_img).enhance(color_level)
-
-        self.reduce_img_size(pil_img, output_path, "enhanced_image")
-
-    def enhance_resolution(self, output_path):
+        version of it. Returns the encoded bytes instead
+        of saving the image if as_bytes is True, otherwise
+        the name of the file saved in output_path '''
+        with metrics.stage("decode"):
+            frame = read_frame(self.__file, timestamp)
+
+        with metrics.stage("filter"):
+            # Normalize image to reduce noise (in place, the decoded frame is not needed anymore)
+            normalized_img = normalize_frame(frame, frame)
+
+            # Apply final enhancements according to parameters (all of them in a single pass)
+            enhanced = enhance(normalized_img, brightness_lvl, sharpness_lvl, 
+                               contrast_level, color_level, bgr=True)
+            rgb_img = cv2.cvtColor(enhanced, cv2.COLOR_BGR2RGB, dst=enhanced)
+
+        with metrics.stage("encode"):
+            encoded = self.reduce_img_size(rgb_img, output_path, "enhanced_image", as_bytes,
+                                           image_format, compression)
+        if as_bytes:
+            metrics.count("bytes_encoded", len(encoded))
+
+        return encoded
+
+    def preview_enhanced_img(self, timestamp, brightness_lvl, sharpness_lvl, 
+                             contrast_level, color_level):
+        ''' Low resolution preview of enhanced_img with
+        the same parameters, fast enough to follow every
+        slider change. The downscaled frame is cached '''
+        proxy, _ = frame_proxy(self.__file, self.get_digest(), timestamp)
+        enhanced = enhance(proxy, brightness_lvl, sharpness_lvl, 
+                           contrast_level, color_level, bgr=True)
+
+        return to_pil(enhanced, bgr=True)
+
+    @instrumented("enhance_resolution")
+    @cached("enhance_resolution")
+    @admitted("enhance_resolution", scale_param="scale")
+    def enhance_resolution(self, output_path, image_format="PNG", compression="balanced", 
+                           scale=1.0, progress=None, metrics=None):
         ''' Enhance the resolution of the image
-        using Super Resolution technique '''
-        MODEL_PATH = "./assets/FSRCNN_x4.pb" 
-
-        img = cv2.imread(self.__file)
+        using Super Resolution technique. Images too
+        large for the worker are downscaled by `scale`
+        first '''
+        with metrics.stage("decode"):
+            img = self.__read_img(cv2.IMREAD_COLOR, scale)
 
         # Apply DNN Super Resolution technique using pre trained model (in our case FSRCNN model)
-        sr = dnn_superres.DnnSuperResImpl_create()
-        sr.readModel(MODEL_PATH)
-        sr.setModel("fsrcnn", 4)
-
-        final_img = sr.upsample(img)
-
-        final_img = cv2.fastNlMeansDenoisingColored(final_img, None, 10, 10, 7, 15) # Remove Noise
-        self.reduce_img_size(final_img, output_path, "enhanced_resolution")
-
-    def apply_filter(self, output_path, filter=None):
-        ''' Apply specified filter to the image '''
-        img = cv2.imread(self.__file, cv2.IMREAD_UNCHANGED)
-
-        if filter == "Pencil Sketch":
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            inverted_img = cv2.bitwise_not(gray)
-            smooth_img = cv2.GaussianBlur(inverted_img, (21,21), sigmaX=0, sigmaY=0)
-
-            final_img = cv2.divide(gray, 255 - smooth_img, scale=256)
-            self.reduce_img_size(final_img, output_path, "pencil_sketch")
-        
-        elif filter == "Faded":
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            self.reduce_img_size(gray, output_path, "faded")
-        
-        elif filter == "Water Colored":
-            final_img = cv2.stylization(img, sigma_s=130, sigma_r=0.20)
-            self.reduce_img_size(final_img, output_path, "water_colored")
-        
-        elif filter == "Cartoonify":
-            smooth_img = cv2.bilateralFilter(img, 10, 250, 250)
-
-            # Work on edge lines
-            gray = cv2.cvtColor(smooth_img, cv2.COLOR_BGR2GRAY)
-            img_blur = cv2.medianBlur(gray, 5)
-            img_edge = cv2.adaptiveThreshold(img_blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
-                                            cv2.THRESH_BINARY, 9, 10)
-
-            # Multiply the original and edge lined img
-            final_img = cv2.bitwise_and(smooth_img, smooth_img, mask=img_edge)
-            cv2.imwrite(f"./{output_path}/cartoonified.png", final_img)
-        
-            self.reduce_img_size(final_img, output_path, "catoonify")
-
-        
-        elif filter == "Document":
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                                    cv2.THRESH_BINARY, 151, 10)
-            final_img = cv2.medianBlur(adaptive_thresh, 3)
-            
-            self.reduce_img_size(final_img, output_path, "document")
-        
-        elif filter == "Vigenette":
+        # tile by tile, removing noise from each upsampled tile
+        with metrics.stage("super_resolution"):
+            final_img = upsample_tiled(img, "fsrcnn", 4, progress=progress)
+
+        with metrics.stage("encode"):
+            self.reduce_img_size(final_img, output_path, "enhanced_resolution", 
+                                 image_format=image_format, compression=compression, bgr=True)
+
+    @instrumented("filter")
+    @cached("filter")
+    @admitted("filter", scale_param="scale")
+    def apply_filter(self, output_path, filter=None, vignette_sigma=450, 
+                     vignette_strength=1.0, image_format="PNG", compression="balanced", 
+                     scale=1.0, progress=None, metrics=None):
+        ''' Apply specified filter to the image. The 
+        Vigenette filter's spread (sigma) and strength 
+        (0 to 1) can be adjusted. Images too large for
+        the worker are downscaled by `scale` first '''
+        with metrics.stage("decode"):
+            img = self.__read_img(cv2.IMREAD_UNCHANGED, scale)
+
+        if filter not in FILTERS: # Unknown filter, nothing to save
+            return
+
+        with metrics.stage("filter"):
             rows, cols = img.shape[:2]
-
-            # Generating vignette mask using Gaussian kernels
-            kernel_x = cv2.getGaussianKernel(cols,450)
-            kernel_y = cv2.getGaussianKernel(rows,450)
-            kernel = kernel_y * kernel_x.T
-            kernel = kernel / kernel.max()
-
-            final_img = np.copy(img)
-            final_img[:, :, :] = 0
-            final_img[:, :, 0] = img[:, :, 0] * kernel
-            final_img[:, :, 1] = img[:, :, 1] * kernel
-            final_img[:, :, 2] = img[:, :, 2] * kernel
-
-            self.reduce_img_size(final_img, output_path, "vigenette")
-        
-        elif filter == "Phantom":
-            # Kernel to apply the effect
-            kernel = np.array([[1, 1, 1], [1, -8, 1], [1, 1, 1]])
-            final_img = cv2.filter2D(img, -1, kernel) # Apply a Filter with given kernel
-
-            self.reduce_img_size(final_img, output_path, "phantom")
-        
-        elif filter == "Negative":
-            final_img = cv2.bitwise_not(img)
-            self.reduce_img_size(final_img, output_path, "negative")
-
-    def extract_txt(self):
-        ''' Extract text from images '''
-        img = cv2.imread(self.__file)
-
-        # Convert image into Grayscale and then apply threshold
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, threshold = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY)
-
-        # Kernel to detect sentences (around rectangle)
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (18, 18))
-
-        # Dilation to create enlarged image of same shape
-        dilated = cv2.dilate(threshold, kernel, 1)
-        
-        # Find contours
-        contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL,  
-                                      cv2.CHAIN_APPROX_NONE) 
-
-        text = ""
-        for cnt in contours:
-            x, y, w, h = cv2.boundingRect(cnt) # Get the coordinated where txt is located 
-
-            cropped_txt_img = img[y:y+h, x:x+w] 
-
-            text += pyt.image_to_string(cropped_txt_img)
+            final_img = make_filter(filter, rows, cols, vignette_sigma, 
+                                    vignette_strength, scale=scale)(img)
+            output_filename = FILTERS[filter][1]
+
+            if filter == "Cartoonify":
+                cv2.imwrite(os.path.join(output_path, "cartoonified.png"), final_img)
+
+        with metrics.stage("encode"):
+            self.reduce_img_size(final_img, output_path, output_filename, 
+                                 image_format=image_format, compression=compression, bgr=True)
+
+    def preview_filter(self, filter=None, vignette_sigma=450, vignette_strength=1.0):
+        ''' Low resolution preview of apply_filter with
+        the same parameters. Kernel sizes are scaled down
+        along with the image so that it looks the same '''
+        if filter not in FILTERS:
+            return None
+
+        proxy, scale = image_proxy(self.__file, self.get_digest())
+        rows, cols = proxy.shape[:2]
+        final_img = make_filter(filter, rows, cols, vignette_sigma, 
+                                vignette_strength, scale=scale)(proxy)
+
+        return to_pil(final_img, bgr=True)
+
+    @instrumented("video_filter")
+    @cached("video_filter")
+    @admitted("video_filter", video=True)
+    def filter_video(self, output_path, filter=None, vignette_sigma=450, 
+                     vignette_strength=1.0, progress=None, metrics=None):
+        ''' Apply specified filter to every frame 
+        of the video, keeping its size and frame rate '''
+        if filter not in FILTERS: # Unknown filter, nothing to save
+            return
+
+        metadata = self.get_metadata()
+        transform = make_filter(filter, metadata.height, metadata.width, vignette_sigma, 
+                                vignette_strength, bgr_output=True)
+        self.__write_video(os.path.join(output_path, f"{FILTERS[filter][1]}.mp4"), 
+                           metrics.timed(transform, "filter"), metadata.fps or 30, 
+                           (metadata.width, metadata.height), progress=progress, metrics=metrics)
+
+    @instrumented("extract_txt")
+    @cached("extract_txt", writes_files=False)
+    @admitted("extract_txt")
+    def extract_txt(self, threshold="otsu", deskew=True, min_area=0.0002, 
+                    max_aspect=5, progress=None, metrics=None):
+        ''' Extract text from images. The page is binarized
+        with an Otsu or adaptive threshold and deskewed, then
+        every text block large enough is read with the page
+        segmentation mode suiting it '''
+        with metrics.stage("decode"):
+            img = cv2.imread(self.__file)
+
+        with metrics.stage("preprocess"):
+            gray, regions = preprocess_page(img, threshold, deskew, 
+                                            min_area=min_area, max_aspect=max_aspect)
+            boxes = [box for box, _ in regions]
+
+        # OCR the regions in parallel
+        with metrics.stage("ocr"):
+            text = "".join(ocr_regions(gray, boxes, progress=progress,
+                                       psms=[psm for _, psm in regions]))
+        metrics.count("regions", len(boxes))
         
-        # " \n\x0c" is a string that is returned when the img does not contain any text 
-        if text !=  " \n\x0c":
+        # Only whitespace and form feeds ("\x0c") are returned when the img does not contain any text 
+        if text.strip(" \n\x0c"):
             return text
\ No newline at end of file
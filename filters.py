@@ -0,0 +1,138 @@
+# Required Imports
+from functools import lru_cache, partial
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+
+# Helper Functions
+@lru_cache(maxsize=8)
+def get_vignette_mask(rows, cols, sigma=450, strength=1.0):
+    ''' Vignette mask (built from Gaussian kernels)
+    for an image of the specified size. Masks are
+    memoized, only the most recent ones are kept '''
+    kernel_x = cv2.getGaussianKernel(cols, sigma, cv2.CV_32F)
+    kernel_y = cv2.getGaussianKernel(rows, sigma, cv2.CV_32F)
+    mask = kernel_y * kernel_x.T
+    mask /= mask.max()
+
+    if strength != 1.0: # Blend between no vignette (0) and the full one (1)
+        mask = 1 - strength * (1 - mask)
+
+    mask = mask[:, :, None] # Broadcasts over the color channels
+    mask.flags.writeable = False # Shared between calls
+
+    return mask
+
+def multiply_mask(img, mask, out=None):
+    ''' Multiply the color channels of the image by a
+    (rows, cols, 1) mask. The result is written into 
+    `out` (allocated if not given) in a single pass '''
+    if out is None:
+        out = np.empty_like(img)
+
+    if img.ndim == 2:
+        np.multiply(img, mask[:, :, 0], out=out, casting="unsafe")
+    else:
+        np.multiply(img[:, :, :3], mask, out=out[:, :, :3], casting="unsafe")
+        out[:, :, 3:] = img[:, :, 3:] # Leave the alpha channel (if any) as it is
+
+    return out
+
+def scaled_ksize(size, scale, minimum=3):
+    ''' Odd kernel size matching `size` on an
+    image resized by `scale` (e.g. a preview) '''
+    return max(int(size * scale) // 2 * 2 + 1, minimum)
+
+def apply_vignette(img, sigma=450, strength=1.0, out=None):
+    ''' Darken the image towards its edges '''
+    rows, cols = img.shape[:2]
+    return multiply_mask(img, get_vignette_mask(rows, cols, sigma, strength), out)
+
+def pencil_sketch(img, scale=1.0):
+    ''' Pencil Sketch filter '''
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    inverted_img = cv2.bitwise_not(gray)
+    ksize = scaled_ksize(21, scale)
+    smooth_img = cv2.GaussianBlur(inverted_img, (ksize,ksize), sigmaX=0, sigmaY=0)
+
+    return cv2.divide(gray, 255 - smooth_img, scale=256)
+
+def faded(img, scale=1.0):
+    ''' Faded filter '''
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def water_colored(img, scale=1.0):
+    ''' Water Colored filter '''
+    return cv2.stylization(img, sigma_s=130 * scale, sigma_r=0.20)
+
+def cartoonify(img, scale=1.0):
+    ''' Cartoonify filter '''
+    smooth_img = cv2.bilateralFilter(img, max(int(10 * scale), 1), 250, 250)
+
+    # Work on edge lines
+    gray = cv2.cvtColor(smooth_img, cv2.COLOR_BGR2GRAY)
+    img_blur = cv2.medianBlur(gray, scaled_ksize(5, scale))
+    img_edge = cv2.adaptiveThreshold(img_blur, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                    cv2.THRESH_BINARY, scaled_ksize(9, scale), 10)
+
+    # Multiply the original and edge lined img
+    return cv2.bitwise_and(smooth_img, smooth_img, mask=img_edge)
+
+def document(img, scale=1.0):
+    ''' Document filter '''
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                            cv2.THRESH_BINARY, scaled_ksize(151, scale), 10)
+    return cv2.medianBlur(adaptive_thresh, 3)
+
+def negative(img, scale=1.0):
+    ''' Negative filter '''
+    return cv2.bitwise_not(img)
+
+# Kernel of the Phantom filter
+PHANTOM_KERNEL = np.array([[1, 1, 1], [1, -8, 1], [1, 1, 1]])
+
+def phantom(img, scale=1.0):
+    ''' Phantom filter '''
+    return cv2.filter2D(img, -1, PHANTOM_KERNEL) # Apply a Filter with given kernel
+
+# Available filters and the names of their output files
+FILTERS = {
+    "Pencil Sketch": (pencil_sketch, "pencil_sketch"),
+    "Water Colored": (water_colored, "water_colored"),
+    "Faded": (faded, "faded"),
+    "Document": (document, "document"),
+    "Cartoonify": (cartoonify, "catoonify"),
+    "Vigenette": (apply_vignette, "vigenette"),
+    "Phantom": (phantom, "phantom"),
+    "Negative": (negative, "negative"),
+}
+
+def make_filter(name, rows, cols, vignette_sigma=450, vignette_strength=1.0, 
+                bgr_output=False, scale=1.0):
+    ''' Get the function applying the named filter to
+    images of the specified size (e.g. every frame of a 
+    video). Per image constants are computed once here 
+    rather than for every image. With bgr_output set, 
+    grayscale results are converted back to 3 channels.
+    Images downscaled by `scale` (previews) get kernels
+    scaled to match the look of the full size image '''
+    if name not in FILTERS:
+        raise ValueError(f"Unknown filter: {name}")
+
+    func = FILTERS[name][0]
+    if func is apply_vignette:
+        mask = get_vignette_mask(rows, cols, vignette_sigma * scale, vignette_strength)
+        func = lambda img: multiply_mask(img, mask)
+    elif scale != 1.0:
+        func = partial(func, scale=scale)
+
+    if not bgr_output:
+        return func
+
+    def bgr_filter(img):
+        final_img = func(img)
+        if final_img.ndim == 2:
+            final_img = cv2.cvtColor(final_img, cv2.COLOR_GRAY2BGR)
+        return final_img
+
+    return bgr_filter
@@ -0,0 +1,147 @@
+# Required Imports
+import os
+import threading
+from queue import Queue, Empty, Full
+
+END_OF_STREAM = object() # Marks the last item passed between stages
+POLL_INTERVAL = 0.1 # Seconds a blocked stage waits before checking for a stop
+
+# Helper Functions
+def read_frames(video, step=1):
+    ''' Yield every `step`th frame of an opened
+    cv2.VideoCapture. Frames in between are only
+    grabbed, so they are never retrieved/converted '''
+    while True:
+        ret, frame = video.read()
+        if not ret:
+            return
+        yield frame
+
+        for _ in range(step - 1):
+            if not video.grab():
+                return
+
+def read_frames_at(video, indices):
+    ''' Yield the frames of an opened cv2.VideoCapture
+    at the specified (increasing) indices, counted from 
+    its current position. Frames in between are only 
+    grabbed, so they are never retrieved/converted '''
+    position = 0
+    for index in indices:
+        while position < index:
+            if not video.grab():
+                return
+            position += 1
+
+        ret, frame = video.read()
+        if not ret:
+            return
+        position += 1
+        yield frame
+
+def put_item(queue, item, stop):
+    ''' Put an item on a bounded queue, giving up
+    if the pipeline is being stopped '''
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=POLL_INTERVAL)
+            return True
+        except Full:
+            continue
+
+    return False
+
+def get_item(queue, stop):
+    ''' Get an item from a queue, returning END_OF_STREAM
+    if the pipeline is being stopped '''
+    while not stop.is_set():
+        try:
+            return queue.get(timeout=POLL_INTERVAL)
+        except Empty:
+            continue
+
+    return END_OF_STREAM
+
+def acquire_slot(slots, stop):
+    ''' Wait for a free in-flight slot, giving up
+    if the pipeline is being stopped '''
+    while not stop.is_set():
+        if slots.acquire(timeout=POLL_INTERVAL):
+            return True
+
+    return False
+
+# FramePipeline class for processing frames from a decoder to an encoder
+class FramePipeline:
+    def __init__(self, transform, workers=None, max_in_flight=16):
+        self.__transform = transform # Function applied to every frame
+        self.__workers = workers or os.cpu_count() or 1
+        self.__max_in_flight = max(max_in_flight, self.__workers)
+
+    def run(self, frames, write):
+        ''' Decode frames on a reader thread, transform them on
+        N worker threads and encode them in their original order
+        on the calling thread. At most `max_in_flight` frames are
+        held at once, so a slow encoder throttles the reader '''
+        decoded, transformed = Queue(self.__max_in_flight), Queue()
+        slots = threading.Semaphore(self.__max_in_flight)
+        stop = threading.Event()
+        errors = []
+
+        def fail(error):
+            errors.append(error)
+            stop.set()
+
+        def decode():
+            try:
+                for index, frame in enumerate(frames):
+                    if not acquire_slot(slots, stop) or \
+                       not put_item(decoded, (index, frame), stop):
+                        return
+            except Exception as error:
+                fail(error)
+            finally:
+                for _ in range(self.__workers):
+                    put_item(decoded, END_OF_STREAM, stop)
+
+        def transform():
+            try:
+                while True:
+                    item = get_item(decoded, stop)
+                    if item is END_OF_STREAM:
+                        break
+                    index, frame = item
+                    transformed.put((index, self.__transform(frame)))
+            except Exception as error:
+                fail(error)
+            finally:
+                transformed.put(END_OF_STREAM)
+
+        stages = [threading.Thread(target=decode, daemon=True)]
+        stages += [threading.Thread(target=transform, daemon=True) 
+                   for _ in range(self.__workers)]
+        for stage in stages:
+            stage.start()
+
+        # Reassemble the frames in order and encode them on the calling thread
+        pending, next_index, finished = {}, 0, 0
+        try:
+            while finished < self.__workers and not stop.is_set():
+                item = get_item(transformed, stop)
+                if item is END_OF_STREAM:
+                    finished += 1
+                    continue
+
+                index, frame = item
+                pending[index] = frame
+                while next_index in pending:
+                    write(pending.pop(next_index))
+                    next_index += 1
+                    slots.release()
+        finally:
+            stop.set()
+            for stage in stages:
+                stage.join()
+
+        if errors:
+            raise errors[0]
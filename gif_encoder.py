@@ -0,0 +1,48 @@
+# Required Imports
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+from PIL import Image # pip install pillow
+
+# Helper Functions
+def sample_frames(video_path, count=8, transform=None):
+    ''' Decode `count` evenly spaced frames of the
+    video (by seeking), e.g. to build a palette from '''
+    video = cv2.VideoCapture(video_path)
+    try:
+        frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames = []
+        for index in np.linspace(0, max(frame_count - 1, 0), count).astype(int):
+            video.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = video.read()
+            if ret:
+                frames.append(transform(frame) if transform else frame)
+    finally:
+        video.release()
+
+    return frames
+
+def build_palette(frames, colors=256):
+    ''' Build one palette shared by all the frames
+    of a GIF from (a sample of) its BGR frames '''
+    if not frames:
+        raise ValueError("Could not read any frames of the video")
+
+    width = min(frame.shape[1] for frame in frames)
+    mosaic = np.vstack([frame[:, :width] for frame in frames]) # Quantize all of them at once
+    rgb = cv2.cvtColor(mosaic, cv2.COLOR_BGR2RGB)
+
+    return Image.fromarray(rgb).quantize(colors=colors)
+
+def quantize_frame(frame, palette):
+    ''' Map a BGR frame onto the shared palette '''
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(rgb).quantize(palette=palette)
+
+def write_gif(output_file, frames, frame_duration):
+    ''' Write the palette frames as a looping GIF,
+    showing each of them for `frame_duration` ms '''
+    if not frames:
+        raise ValueError("Could not read any frames of the video")
+
+    frames[0].save(output_file, save_all=True, append_images=frames[1:],
+                   duration=frame_duration, loop=0)
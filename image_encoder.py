@@ -0,0 +1,79 @@
+# Required Imports
+import io
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+from PIL import Image # pip install pillow
+from encoders import choose_interpolation
+
+# Supported output formats and their file extensions
+IMAGE_FORMATS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+# Encoder options per (format, compression level). "fast" encodes
+# quickest, "small" gives the smallest files, "balanced" is in between
+SAVE_OPTIONS = {
+    ("PNG", "fast"): {"compress_level": 1},
+    ("PNG", "balanced"): {"compress_level": 6},
+    ("PNG", "small"): {"compress_level": 9, "optimize": True},
+    ("JPEG", "fast"): {"quality": 90},
+    ("JPEG", "balanced"): {"quality": 90, "optimize": True},
+    ("JPEG", "small"): {"quality": 80, "optimize": True, "progressive": True},
+    ("WEBP", "fast"): {"quality": 90, "method": 0},
+    ("WEBP", "balanced"): {"quality": 85, "method": 4},
+    ("WEBP", "small"): {"quality": 80, "method": 6},
+}
+COMPRESSION_LEVELS = ("fast", "balanced", "small")
+
+# Largest output size (landscape), portrait images get the transposed size
+MAX_SIZE = (1280, 720)
+
+# Helper Functions
+def fit_size(width, height, max_size=MAX_SIZE):
+    ''' Largest size fitting within max_size (transposed
+    for portrait images) keeping the aspect ratio.
+    Images are never upscaled '''
+    max_width, max_height = max_size if width >= height else max_size[::-1]
+    scale = min(max_width / width, max_height / height, 1.0)
+
+    return max(int(width * scale), 1), max(int(height * scale), 1)
+
+def to_pil(img, bgr=False):
+    ''' PIL image from a numpy array (grayscale, 3 or 4
+    channels, BGR order if bgr is set) or a PIL image '''
+    if isinstance(img, Image.Image):
+        return img
+
+    if bgr and img.ndim == 3:
+        code = cv2.COLOR_BGRA2RGBA if img.shape[2] == 4 else cv2.COLOR_BGR2RGB
+        img = cv2.cvtColor(img, code)
+
+    return Image.fromarray(np.ascontiguousarray(img))
+
+def resize_to_fit(img, max_size=MAX_SIZE):
+    ''' Resize a numpy array or PIL image to fit within
+    max_size. Downscaling uses area interpolation, which
+    is both fast and free of aliasing '''
+    if isinstance(img, Image.Image):
+        size = fit_size(*img.size, max_size)
+        return img if size == img.size else img.resize(size, Image.LANCZOS)
+
+    height, width = img.shape[:2]
+    size = fit_size(width, height, max_size)
+    interpolation = choose_interpolation((width, height), size)
+
+    return img if interpolation is None else cv2.resize(img, size, interpolation=interpolation)
+
+def encode_image(img, format="PNG", compression="balanced", max_size=MAX_SIZE, bgr=False):
+    ''' Resize the image to fit within max_size and
+    encode it in the given format. Returns the bytes '''
+    format = format.upper()
+    if (format, compression) not in SAVE_OPTIONS:
+        raise ValueError(f"Unsupported image format or compression: {format}, {compression}")
+
+    pil_img = to_pil(resize_to_fit(img, max_size), bgr)
+    if format == "JPEG" and pil_img.mode not in ("RGB", "L"): # No alpha channel in JPEG
+        pil_img = pil_img.convert("RGB")
+
+    buffer = io.BytesIO()
+    pil_img.save(buffer, format=format, **SAVE_OPTIONS[(format, compression)])
+
+    return buffer.getvalue()
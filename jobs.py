@@ -0,0 +1,106 @@
+# Required Imports
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Job states
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+class JobCancelled(Exception):
+    ''' Raised inside a job once it has been cancelled '''
+
+# Job class holding the state of a single background job
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.progress = 0.0 # Fraction of the work completed
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.__cancelled = threading.Event()
+        self.future = None
+
+    def report_progress(self, fraction):
+        ''' Progress callback passed to the job function.
+        Raises JobCancelled once the job is cancelled,
+        which stops the processing loop calling it '''
+        if self.__cancelled.is_set():
+            raise JobCancelled(self.id)
+        self.progress = min(max(fraction, 0.0), 1.0)
+
+    def cancel(self):
+        ''' Ask the job to stop '''
+        self.__cancelled.set()
+        if self.future is not None and self.future.cancel(): # Not started yet
+            self.finished_at = time.time()
+            self.status = CANCELLED
+
+    def finished(self):
+        ''' Whether the job has stopped,
+        successfully or not '''
+        return self.status in (DONE, FAILED, CANCELLED)
+
+# JobExecutor class for running processing jobs in the background
+class JobExecutor:
+    def __init__(self, max_workers=2, keep_finished=100):
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers) # Concurrency limit
+        self.__keep_finished = keep_finished
+        self.__jobs = {}
+        self.__lock = threading.Lock()
+
+    def __run(self, job, func, args, kwargs):
+        ''' Run the job function, recording its outcome '''
+        job.status = RUNNING
+        try:
+            job.report_progress(0.0)
+            job.result = func(*args, progress=job.report_progress, **kwargs)
+            job.progress = 1.0
+            status = DONE
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as error:
+            job.error = error
+            status = FAILED
+
+        # A finished job always has its finish time
+        job.finished_at = time.time()
+        job.status = status
+
+    def submit(self, job_id, func, *args, **kwargs):
+        ''' Queue func(*args, progress=callback, **kwargs) as
+        a job. If an unfinished job with the same id exists,
+        it is returned instead of starting a new one '''
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is not None and not job.finished():
+                return job
+
+            job = Job(job_id)
+            self.__jobs[job_id] = job
+            job.future = self.__executor.submit(self.__run, job, func, args, kwargs)
+            self.__prune()
+
+        return job
+
+    def get(self, job_id):
+        ''' Get the job with the specified id (if any) '''
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def cancel(self, job_id):
+        ''' Cancel the job with the specified id '''
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def __prune(self):
+        ''' Forget the oldest finished jobs '''
+        finished = sorted((job for job in self.__jobs.values()
+                           if job.finished() and job.finished_at is not None),
+                          key=lambda job: job.finished_at)
+        for job in finished[:max(len(finished) - self.__keep_finished, 0)]:
+            del self.__jobs[job.id]
+
+# Executor shared by the whole process
+JOB_EXECUTOR = JobExecutor()
@@ -0,0 +1,181 @@
+# Required Imports
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Optional outputs, enabled through environment variables
+TIMING_LOG_PATH = os.environ.get("MONOSHOT_TIMING_LOG") # JSON lines, one per operation
+METRICS_FILE_PATH = os.environ.get("MONOSHOT_METRICS_FILE") # Prometheus text format
+
+# Helper Functions
+def file_sizes(path):
+    ''' Map of file name to (modification time, size)
+    for every file inside the directory '''
+    if not path or not os.path.isdir(path):
+        return {}
+
+    sizes = {}
+    for entry in os.scandir(path):
+        if entry.is_file():
+            stat = entry.stat()
+            sizes[entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+    return sizes
+
+# Metrics class for timing the stages of a single operation
+class Metrics:
+    def __init__(self, operation):
+        self.operation = operation
+        self.status = "ok"
+        self.seconds = 0.0
+        self.stages = defaultdict(float) # Seconds spent per stage, summed over threads
+        self.counters = defaultdict(int) # E.g. frames, bytes_written
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        ''' Time the enclosed block as part of a stage '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.__lock:
+                self.stages[name] += elapsed
+
+    def count(self, name, amount=1):
+        ''' Increase a counter '''
+        with self.__lock:
+            self.counters[name] += amount
+
+    def timed(self, func, stage):
+        ''' Wrap the function so that every call
+        is timed as part of the stage '''
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def timed_iter(self, iterable, stage):
+        ''' Iterate over the iterable, timing the
+        production of every item as part of the stage '''
+        iterator = iter(iterable)
+        while True:
+            with self.stage(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def report(self):
+        ''' Summary of the operation '''
+        with self.__lock:
+            return {"operation": self.operation, "status": self.status,
+                    "seconds": round(self.seconds, 6),
+                    "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                    "counters": dict(self.counters)}
+
+# MetricsRegistry class for aggregating metrics of all operations
+class MetricsRegistry:
+    def __init__(self, timing_log_path=None, metrics_file_path=None):
+        self.__timing_log_path = timing_log_path
+        self.__metrics_file_path = metrics_file_path
+        self.__operations = defaultdict(int) # (operation, status) -> count
+        self.__seconds = defaultdict(float) # operation -> seconds
+        self.__stages = defaultdict(float) # (operation, stage) -> seconds
+        self.__counters = defaultdict(int) # (operation, counter) -> total
+        self.__lock = threading.Lock()
+
+    def observe(self, metrics):
+        ''' Add a finished operation to the totals and
+        write the optional timing log and metrics file '''
+        report = metrics.report()
+        with self.__lock:
+            self.__operations[(metrics.operation, metrics.status)] += 1
+            self.__seconds[metrics.operation] += metrics.seconds
+            for name, seconds in report["stages"].items():
+                self.__stages[(metrics.operation, name)] += seconds
+            for name, amount in report["counters"].items():
+                self.__counters[(metrics.operation, name)] += amount
+
+            if self.__timing_log_path:
+                with open(self.__timing_log_path, "a") as timing_log:
+                    timing_log.write(json.dumps(dict(report, time=time.time())) + "\n")
+
+            if self.__metrics_file_path:
+                temp_path = f"{self.__metrics_file_path}.tmp"
+                with open(temp_path, "w") as metrics_file:
+                    metrics_file.write(self.__prometheus_text())
+                os.replace(temp_path, self.__metrics_file_path) # Scrapers never see a partial file
+
+    def prometheus_text(self):
+        ''' Totals in the Prometheus text exposition format '''
+        with self.__lock:
+            return self.__prometheus_text()
+
+    def __prometheus_text(self):
+        lines = []
+
+        def metric(name, help_txt, samples):
+            lines.append(f"# HELP {name} {help_txt}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(samples):
+                label_txt = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_txt}}} {value}")
+
+        metric("monoshot_operations_total", "Processed operations.",
+               [((("operation", op), ("status", status)), count)
+                for (op, status), count in self.__operations.items()])
+        metric("monoshot_operation_seconds_total", "Wall clock time spent in operations.",
+               [((("operation", op),), seconds) for op, seconds in self.__seconds.items()])
+        metric("monoshot_stage_seconds_total", "Time spent per stage, summed over threads.",
+               [((("operation", op), ("stage", stage)), seconds)
+                for (op, stage), seconds in self.__stages.items()])
+        for counter in sorted({name for _, name in self.__counters}):
+            metric(f"monoshot_{counter}_total", f"Total {counter.replace('_', ' ')}.",
+                   [((("operation", op),), amount)
+                    for (op, name), amount in self.__counters.items() if name == counter])
+
+        return "\n".join(lines) + "\n"
+
+# Registry shared by the whole process
+METRICS_REGISTRY = MetricsRegistry(TIMING_LOG_PATH, METRICS_FILE_PATH)
+
+def instrumented(operation):
+    ''' Decorator for FileProcessor methods. The method gets
+    a Metrics object as its `metrics` argument to time its
+    stages with; callers may pass a callback as `metrics`
+    instead, which receives the report once the method is
+    done. Bytes written to output_path are counted too '''
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(processor, *args, metrics=None, **kwargs):
+            collector = Metrics(operation)
+            output_path = signature.bind_partial(processor, *args, **kwargs) \
+                                   .arguments.get("output_path")
+            before = file_sizes(output_path)
+            start = time.perf_counter()
+            try:
+                return method(processor, *args, metrics=collector, **kwargs)
+            except BaseException:
+                collector.status = "failed"
+                raise
+            finally:
+                collector.seconds = time.perf_counter() - start
+                after = file_sizes(output_path)
+                collector.count("bytes_written", sum(size for name, (mtime, size) in after.items()
+                                                     if before.get(name, (None,))[0] != mtime))
+                METRICS_REGISTRY.observe(collector)
+                if metrics:
+                    metrics(collector.report())
+        return wrapper
+    return decorator
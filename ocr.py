@@ -0,0 +1,177 @@
+# Required Imports
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+from backends import BACKEND_REGISTRY
+
+# Every region gets its own tesseract process, so keep each of them single threaded
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Tesseract page segmentation modes: automatic page layout,
+# a single uniform block of text and a single line of text
+PSM_AUTO, PSM_BLOCK, PSM_LINE = 3, 6, 7
+
+# Helper Functions
+def reading_order(boxes, line_tolerance=10):
+    ''' Sort (x, y, w, h) boxes top to bottom and then
+    left to right. Boxes whose tops are within
+    `line_tolerance` pixels of the top of the line's
+    first (highest) box are taken as one line '''
+    lines = []
+    for box in sorted(boxes, key=lambda box: box[1]):
+        if lines and box[1] - lines[-1][0][1] <= line_tolerance: # Close to the top of the line
+            lines[-1].append(box)
+        else:
+            lines.append([box])
+
+    return [box for line in lines for box in sorted(line, key=lambda box: box[0])]
+
+def binarize(gray, method="otsu", block_size=31):
+    ''' Threshold the grayscale image into white text on
+    a black background, with a global (Otsu) or a local
+    (adaptive, for uneven lighting) threshold '''
+    if method == "otsu":
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    if method == "adaptive":
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY_INV, block_size, 15)
+
+    raise ValueError(f"Unknown threshold method: {method}")
+
+def estimate_skew(binary, max_angle=15):
+    ''' Angle (in degrees, clockwise) of the text lines,
+    the median orientation of the blobs made by joining
+    the characters of each line. 0 if there is no line or
+    the angle is too large to be a skewed document '''
+    lines = cv2.dilate(binary, cv2.getStructuringElement(cv2.MORPH_RECT, (25, 3)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    angles = []
+    for cnt in contours:
+        x, y, w, h = cv2.boundingRect(cnt)
+        if w < 4 * h or w < 50: # Only long, thin blobs tell the line direction
+            continue
+        m = cv2.moments(cnt)
+        angles.append(np.degrees(0.5 * np.arctan2(2 * m["mu11"], m["mu20"] - m["mu02"])))
+
+    angle = float(np.median(angles)) if angles else 0.0
+    return angle if abs(angle) <= max_angle else 0.0
+
+def rotate(img, angle):
+    ''' Rotate the image counter clockwise by the
+    angle (in degrees) around its center '''
+    rows, cols = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((cols / 2, rows / 2), angle, 1.0)
+
+    return cv2.warpAffine(img, matrix, (cols, rows), flags=cv2.INTER_LINEAR, 
+                          borderMode=cv2.BORDER_REPLICATE)
+
+def merge_boxes(boxes, gap=0):
+    ''' Merge (x, y, w, h) boxes overlapping each other
+    (or closer than `gap` pixels) until none of them do.
+    Every pass sweeps the boxes left to right, so a box is
+    only compared with the ones still reaching its left edge '''
+    boxes = [tuple(box) for box in boxes]
+    while True:
+        done, active = [], []
+        for x, y, w, h in sorted(boxes):
+            done += [a for a in active if a[0] + a[2] <= x - gap] # Ending left of this box
+            active = [a for a in active if a[0] + a[2] > x - gap]
+            for a in active:
+                if a[1] - gap < y + h and y - gap < a[1] + a[3]:
+                    right, bottom = max(a[0] + a[2], x + w), max(a[1] + a[3], y + h)
+                    a[1] = min(a[1], y)
+                    a[2], a[3] = right - a[0], bottom - a[1]
+                    break
+            else:
+                active.append([x, y, w, h])
+
+        merged = done + active
+        if len(merged) == len(boxes): # Nothing merged in this pass
+            return [tuple(box) for box in merged]
+        boxes = merged
+
+def count_lines(binary):
+    ''' Number of text lines of a binarized region,
+    i.e. the runs of rows containing any text '''
+    rows = np.concatenate(([False], binary.any(axis=1)))
+    return int(np.count_nonzero(rows[1:] & ~rows[:-1]))
+
+def find_text_regions(binary, kernel_size=(18, 18), min_area=0.0002, 
+                      max_aspect=5, min_height=8, max_regions=40):
+    ''' Find the text blocks of a binarized page and pick
+    the page segmentation mode to read each of them with.
+    Blocks smaller than `min_area` (fraction of the page),
+    taller than `max_aspect` times their width or wider
+    than that and thinner than a `min_height` pixels line
+    of text (rules, borders) are dropped and overlapping
+    ones merged. With too many (or a single, page sized)
+    block(s) the whole page is read at once.
+    Returns [((x, y, w, h), psm)] '''
+    rows, cols = binary.shape[:2]
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
+    dilated = cv2.dilate(binary, kernel)
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = [(x, y, w, h) for x, y, w, h in map(cv2.boundingRect, contours)
+             if w * h >= min_area * rows * cols and h <= max_aspect * w and 
+             not (w > max_aspect * h and h - kernel_size[1] + 1 < min_height)] # Height before dilating
+
+    if not boxes:
+        return []
+    if len(boxes) > max_regions: # Checked before merging, which is the costly part
+        return [((0, 0, cols, rows), PSM_AUTO)]
+
+    boxes = reading_order(merge_boxes(boxes))
+    if len(boxes) == 1 and boxes[0][2] * boxes[0][3] > 0.5 * rows * cols:
+        return [((0, 0, cols, rows), PSM_AUTO)]
+
+    return [((x, y, w, h), PSM_LINE if count_lines(binary[y:y+h, x:x+w]) == 1 else PSM_BLOCK)
+            for x, y, w, h in boxes]
+
+def preprocess_page(img, threshold="otsu", deskew=True, **region_options):
+    ''' Grayscale, binarize and (optionally) deskew the page
+    and find its text regions. Returns the grayscale page to
+    read and its [((x, y, w, h), psm)] regions '''
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    binary = binarize(gray, threshold)
+
+    if deskew:
+        angle = estimate_skew(binary)
+        if abs(angle) >= 0.5: # Straighten the lines before looking for regions
+            gray = rotate(gray, angle)
+            binary = binarize(gray, threshold)
+
+    return gray, find_text_regions(binary, **region_options)
+
+def ocr_regions(img, boxes, workers=None, config="", progress=None, psms=None, padding=4):
+    ''' Run tesseract on every (x, y, w, h) region of
+    the image using a bounded pool of workers, with the
+    page segmentation mode of the region (if given). The
+    texts are returned in the same order as the boxes '''
+    workers = workers or os.cpu_count() or 1
+    pyt = BACKEND_REGISTRY.get("pytesseract") # pip install pytesseract
+
+    def ocr_region(box, psm):
+        x, y, w, h = box # Tesseract reads better with a small margin around the text
+        crop = img[max(y - padding, 0):y + h + padding, max(x - padding, 0):x + w + padding]
+        region_config = f"--psm {psm} {config}".strip() if psm else config
+        return pyt.image_to_string(crop, config=region_config)
+
+    # Tesseract runs in a subprocess, so threads are enough to run regions in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(ocr_region, box, psm) 
+                   for box, psm in zip(boxes, psms or [None] * len(boxes))]
+        try:
+            texts = []
+            for future in futures:
+                texts.append(future.result())
+                if progress:
+                    progress(len(texts) / len(futures))
+        except BaseException:
+            for future in futures: # Do not start the remaining regions
+                future.cancel()
+            raise
+
+    return texts
@@ -0,0 +1,56 @@
+# Required Imports
+from functools import lru_cache
+import cv2 # pip install opencv-python
+from image_encoder import fit_size
+
+# Largest size of preview proxies (landscape, transposed for portrait)
+PREVIEW_SIZE = (640, 360)
+
+# Helper Functions
+def read_frame(path, timestamp):
+    ''' Decode the frame of the video shown
+    at the timestamp (in milliseconds) '''
+    video = cv2.VideoCapture(path)
+    try:
+        video.set(cv2.CAP_PROP_POS_MSEC, timestamp)
+        ret, frame = video.read()
+    finally:
+        video.release()
+
+    if not ret:
+        raise ValueError(f"Could not read the frame at {timestamp} ms")
+
+    return frame
+
+def normalize_frame(frame, out=None):
+    ''' Stretch the frame to the full 0 to 255 range,
+    which reduces the noise of dull frames '''
+    return cv2.normalize(frame, out, 0, 255, cv2.NORM_MINMAX)
+
+def downscale(img, max_size=PREVIEW_SIZE):
+    ''' Shrink the image to fit within max_size. Returns
+    the proxy image and its scale relative to the image '''
+    height, width = img.shape[:2]
+    size = fit_size(width, height, max_size)
+    if size == (width, height):
+        return img, 1.0
+
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA), size[0] / width
+
+@lru_cache(maxsize=16)
+def image_proxy(path, digest, max_size=PREVIEW_SIZE):
+    ''' Downscaled copy of the image and its scale. The
+    digest ties the cached proxy to the file contents '''
+    proxy, scale = downscale(cv2.imread(path, cv2.IMREAD_UNCHANGED), max_size)
+    proxy.flags.writeable = False # Shared between previews
+
+    return proxy, scale
+
+@lru_cache(maxsize=16)
+def frame_proxy(path, digest, timestamp, max_size=PREVIEW_SIZE):
+    ''' Downscaled copy of the video frame at the timestamp,
+    normalized first just like the full resolution frame '''
+    proxy, scale = downscale(normalize_frame(read_frame(path, timestamp)), max_size)
+    proxy.flags.writeable = False # Shared between previews
+
+    return proxy, scale
@@ -0,0 +1,181 @@
+# Required Imports
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+CHUNK_SIZE = 1 << 20 # Bytes read at a time while hashing a file
+
+# Helper Functions
+def file_digest(file_path):
+    ''' SHA-256 digest of the file contents '''
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def list_files(path):
+    ''' Names of the files inside the directory '''
+    return sorted(entry.name for entry in os.scandir(path) if entry.is_file())
+
+# ResultCache class for storing processed outputs on disk
+class ResultCache:
+    META_FILE = "result.json"
+    VALUE_FILE = "value.bin"
+
+    def __init__(self, cache_dir="./cache_data", max_bytes=512 * 1024 * 1024):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        self.enabled = True
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def make_key(self, digest, operation, params):
+        ''' Cache key made of the input file digest,
+        the operation and its parameters '''
+        payload = json.dumps([digest, operation, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key, output_path=None):
+        ''' Look up an entry, copying its files into
+        output_path. Returns (hit, value) '''
+        entry_dir = os.path.join(self.__cache_dir, key)
+        meta_path = os.path.join(entry_dir, self.META_FILE)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            for filename in meta["files"]:
+                shutil.copyfile(os.path.join(entry_dir, filename),
+                                os.path.join(output_path, filename))
+
+            value = meta["value"]
+            if meta["binary"]: # Bytes are kept in a file of their own
+                with open(os.path.join(entry_dir, self.VALUE_FILE), "rb") as value_file:
+                    value = value_file.read()
+
+            os.utime(meta_path) # Mark the entry as recently used
+        except (OSError, ValueError, KeyError):
+            with self.__lock:
+                self.misses += 1
+            return False, None
+
+        with self.__lock:
+            self.hits += 1
+        return True, value
+
+    def put(self, key, value, output_path=None, files=()):
+        ''' Store the return value and the specified
+        files from output_path as a cache entry '''
+        os.makedirs(self.__cache_dir, exist_ok=True)
+        entry_dir = os.path.join(self.__cache_dir, key)
+        staging_dir = tempfile.mkdtemp(dir=self.__cache_dir, prefix=".staging-")
+
+        try:
+            for filename in files:
+                shutil.copyfile(os.path.join(output_path, filename),
+                                os.path.join(staging_dir, filename))
+            binary = isinstance(value, bytes)
+            if binary:
+                with open(os.path.join(staging_dir, self.VALUE_FILE), "wb") as value_file:
+                    value_file.write(value)
+                value = None
+
+            with open(os.path.join(staging_dir, self.META_FILE), "w") as meta_file:
+                json.dump({"value": value, "binary": binary, "files": sorted(files)}, meta_file)
+
+            os.rename(staging_dir, entry_dir) # Publish the entry atomically
+        except OSError: # Entry already stored by a concurrent request
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        ''' Remove the least recently used entries
+        until the cache fits in max_bytes '''
+        with self.__lock:
+            entries = []
+            for entry in os.scandir(self.__cache_dir):
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                try:
+                    files = list(os.scandir(entry.path))
+                    size = sum(file.stat().st_size for file in files)
+                    last_used = os.stat(os.path.join(entry.path, self.META_FILE)).st_mtime
+                except OSError:
+                    continue
+                entries.append((last_used, size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.__max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        ''' Hit/Miss counters of the cache '''
+        with self.__lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+# Cache shared by the whole process
+RESULT_CACHE = ResultCache()
+
+def cached(operation, writes_files=True):
+    ''' Decorator for FileProcessor methods that serves
+    repeated requests (same input file and parameters)
+    from RESULT_CACHE. Methods writing files take the
+    output directory as their first argument '''
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(processor, *args, **kwargs):
+            if not RESULT_CACHE.enabled:
+                return method(processor, *args, **kwargs)
+
+            bound = signature.bind(processor, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            del params["self"]
+            params.pop("progress", None) # Callbacks do not change the result
+            metrics = params.pop("metrics", None)
+            output_path = params.pop("output_path") if writes_files else None
+
+            key = RESULT_CACHE.make_key(processor.get_digest(), operation, params)
+            hit, value = RESULT_CACHE.get(key, output_path)
+            if hit:
+                if metrics is not None:
+                    metrics.count("cache_hits")
+                return value
+
+            if not writes_files:
+                value = method(processor, *args, **kwargs)
+                RESULT_CACHE.put(key, value)
+                return value
+
+            # The method writes to a private directory, so that the files
+            # of other jobs sharing output_path are never taken for its own
+            staging_dir = tempfile.mkdtemp(prefix=".staging-",
+                                           dir=os.path.dirname(os.path.abspath(output_path)))
+            try:
+                bound.arguments["output_path"] = staging_dir
+                value = method(*bound.args, **bound.kwargs)
+                files = list_files(staging_dir)
+                RESULT_CACHE.put(key, value, staging_dir, files)
+                for filename in files:
+                    shutil.move(os.path.join(staging_dir, filename), 
+                                os.path.join(output_path, filename))
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+            return value
+        return wrapper
+    return decorator
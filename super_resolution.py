@@ -0,0 +1,160 @@
+# Required Imports
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import cv2 # pip install opencv-python
+import numpy as np # pip install numpy
+from backends import BACKEND_REGISTRY
+
+# Pre trained Super Resolution models, keyed by (model name, scale)
+MODEL_PATHS = {
+    ("fsrcnn", 4): "./assets/FSRCNN_x4.pb",
+}
+
+# ModelRegistry class for loading and sharing Super Resolution models
+class ModelRegistry:
+    def __init__(self, model_paths):
+        self.__model_paths = model_paths
+        self.__idle = {} # Loaded instances not in use, per (model name, scale)
+        self.__lock = threading.Lock()
+
+    def __load(self, name, scale):
+        ''' Parse the model file and set up
+        a new network instance '''
+        try:
+            model_path = self.__model_paths[(name, scale)]
+        except KeyError:
+            raise ValueError(f"No Super Resolution model registered for {name} x{scale}")
+
+        dnn_superres = BACKEND_REGISTRY.get("dnn_superres") # pip install opencv-contrib-python
+        sr = dnn_superres.DnnSuperResImpl_create()
+        sr.readModel(model_path)
+        sr.setModel(name, scale)
+
+        return sr
+
+    @contextmanager
+    def acquire(self, name="fsrcnn", scale=4):
+        ''' Check out a loaded model for exclusive use
+        by the calling thread. The instance goes back to
+        the registry afterwards so that it can be reused '''
+        key = (name, scale)
+        with self.__lock:
+            idle = self.__idle.setdefault(key, [])
+            sr = idle.pop() if idle else None
+
+        if sr is None: # Every instance is busy (or none loaded yet)
+            sr = self.__load(name, scale)
+
+        try:
+            yield sr
+        finally:
+            with self.__lock:
+                self.__idle[key].append(sr)
+
+    def warm_up(self, models=None, instances=1):
+        ''' Load the specified models ahead of time so
+        that the first request does not pay for it '''
+        for name, scale in models or self.__model_paths:
+            key = (name, scale)
+            with self.__lock:
+                missing = instances - len(self.__idle.setdefault(key, []))
+
+            loaded = [self.__load(name, scale) for _ in range(missing)]
+            with self.__lock:
+                self.__idle[key].extend(loaded)
+
+# Registry shared by the whole process
+MODEL_REGISTRY = ModelRegistry(MODEL_PATHS)
+
+# Helper Functions
+def get_tile_starts(length, tile_size, overlap):
+    ''' Start positions of tiles along an axis so that
+    consecutive tiles share exactly `overlap` pixels '''
+    stride = tile_size - overlap
+    return list(range(0, max(length - overlap, 1), stride))
+
+def get_blend_weights(length, overlap, first, last):
+    ''' Linear feathering weights of a tile along an axis.
+    Weights of two neighbouring tiles add up to 1 across
+    their shared overlap '''
+    weights = np.ones(length, np.float32)
+    if overlap:
+        ramp = (np.arange(overlap, dtype=np.float32) + 0.5) / overlap
+        if not first:
+            weights[:overlap] = ramp
+        if not last:
+            weights[-overlap:] = ramp[::-1]
+
+    return weights
+
+def upsample_tile(img, box, name, scale, denoise):
+    ''' Upsample (and denoise) a single tile of the image '''
+    y0, y1, x0, x1 = box
+    tile = np.ascontiguousarray(img[y0:y1, x0:x1])
+
+    with MODEL_REGISTRY.acquire(name, scale) as sr:
+        tile = sr.upsample(tile)
+
+    if denoise:
+        tile = cv2.fastNlMeansDenoisingColored(tile, None, 10, 10, 7, 15) # Remove Noise
+
+    return tile
+
+def upsample_tiled(img, name="fsrcnn", scale=4, tile_size=256, 
+                   overlap=16, workers=None, denoise=True, progress=None):
+    ''' Apply Super Resolution to the image tile by tile.
+    Tiles are processed in a thread pool (OpenCV releases the GIL)
+    and feathered together into a preallocated output, so the
+    working memory is bounded by the tile size. progress is 
+    called with the fraction of tiles done '''
+    if not 0 <= overlap * 2 <= tile_size:
+        raise ValueError("Overlap must be at most half of the tile size")
+
+    workers = workers or os.cpu_count() or 1
+    rows, cols = img.shape[:2]
+    final_img = np.zeros((rows * scale, cols * scale) + img.shape[2:], np.uint8)
+
+    row_starts = get_tile_starts(rows, tile_size, overlap)
+    col_starts = get_tile_starts(cols, tile_size, overlap)
+    boxes = [(y0, min(y0 + tile_size, rows), x0, min(x0 + tile_size, cols))
+             for y0 in row_starts for x0 in col_starts]
+    blended_tiles = 0
+
+    def blend(box, tile):
+        nonlocal blended_tiles
+        y0, y1, x0, x1 = box
+        weight_y = get_blend_weights(tile.shape[0], overlap * scale, 
+                                    y0 == 0, y1 == rows)
+        weight_x = get_blend_weights(tile.shape[1], overlap * scale, 
+                                    x0 == 0, x1 == cols)
+        weights = weight_y[:, None] * weight_x[None, :]
+        if tile.ndim == 3:
+            weights = weights[:, :, None]
+
+        region = final_img[y0*scale:y1*scale, x0*scale:x1*scale]
+        blended = region + tile * weights
+        np.clip(np.rint(blended, out=blended), 0, 255, out=blended)
+        region[...] = blended
+
+        blended_tiles += 1
+        if progress:
+            progress(blended_tiles / len(boxes))
+
+    # Only keep a few tiles in flight so that finished tiles do not pile up
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for box in boxes:
+            pending.append((box, executor.submit(upsample_tile, img, box, 
+                                                name, scale, denoise)))
+            if len(pending) >= workers * 2:
+                box, future = pending.popleft()
+                blend(box, future.result())
+
+        while pending:
+            box, future = pending.popleft()
+            blend(box, future.result())
+
+    return final_img
@@ -0,0 +1,136 @@
+# Required Imports
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from result_cache import file_digest
+
+# Where the session workspaces live. Set MONOSHOT_USE_SHM=1 to keep
+# them in memory (/dev/shm) or MONOSHOT_WORKSPACE_ROOT to choose the directory
+SHM_PATH = "/dev/shm"
+WORKSPACE_TTL = int(os.environ.get("MONOSHOT_WORKSPACE_TTL", "3600")) # Seconds unused before removal
+CHUNK_SIZE = 1024 * 1024 # Uploads are written 1 MB at a time
+
+# Helper Functions
+def default_root():
+    ''' Directory holding all the workspaces of
+    this process, by default in the system temp dir '''
+    if os.environ.get("MONOSHOT_WORKSPACE_ROOT"):
+        return os.environ["MONOSHOT_WORKSPACE_ROOT"]
+    if os.environ.get("MONOSHOT_USE_SHM") == "1" and os.path.isdir(SHM_PATH):
+        return os.path.join(SHM_PATH, "monoshot")
+
+    return os.path.join(tempfile.gettempdir(), "monoshot")
+
+def stream_digest(file, chunk_size=CHUNK_SIZE):
+    ''' SHA-256 digest of the contents of a file object '''
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+# Workspace class for the private directories of a single session
+class Workspace:
+    def __init__(self, path):
+        self.path = path
+        self.uploads = os.path.join(path, "uploads")
+        self.processed = os.path.join(path, "processed")
+        os.makedirs(self.uploads, exist_ok=True)
+        os.makedirs(self.processed, exist_ok=True)
+        self.__digests = {} # Upload path -> [(size, mtime), digest]
+        self.__lock = threading.Lock()
+
+    def save_upload(self, file, filename, file_id=None, chunk_size=CHUNK_SIZE):
+        ''' Stream an uploaded file object into the workspace
+        in chunks and return its path. Uploads are keyed on the
+        uploader's file id (or on their contents if there is no
+        id), so an upload is written only once per session and
+        another file of the same name is never taken for it '''
+        key = os.path.basename(str(file_id)) if file_id is not None else stream_digest(file, chunk_size)
+        upload_dir = os.path.join(self.uploads, key)
+        path = os.path.join(upload_dir, os.path.basename(filename))
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(upload_dir, exist_ok=True)
+        file.seek(0)
+        with tempfile.NamedTemporaryFile(dir=upload_dir, delete=False) as temp_file:
+            shutil.copyfileobj(file, temp_file, chunk_size)
+        os.replace(temp_file.name, path) # Jobs never see a partially written file
+
+        return path
+
+    def digest(self, path):
+        ''' Content hash of a file of the workspace, computed
+        once per version of the file (its size and mtime)
+        instead of on every rerun of the session '''
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self.__lock:
+            entry = self.__digests.get(path)
+            if entry is None or entry[0] != version:
+                entry = self.__digests[path] = [version, file_digest(path)]
+
+            return entry[1]
+
+    def clear_processed(self):
+        ''' Remove the processed files of the session '''
+        shutil.rmtree(self.processed, ignore_errors=True)
+        os.makedirs(self.processed, exist_ok=True)
+
+# WorkspaceManager class for creating and reference counting session workspaces
+class WorkspaceManager:
+    def __init__(self, root, ttl=WORKSPACE_TTL):
+        self.root = root
+        self.ttl = ttl
+        self.__entries = {} # session id -> [workspace, references, last released]
+        self.__lock = threading.Lock()
+
+    def acquire(self, session_id):
+        ''' Get the workspace of the session (created on first
+        use) and hold a reference to it until released '''
+        with self.__lock:
+            self.__sweep()
+            entry = self.__entries.get(session_id)
+            if entry is None:
+                os.makedirs(self.root, exist_ok=True)
+                path = tempfile.mkdtemp(prefix="session_", dir=self.root)
+                entry = self.__entries[session_id] = [Workspace(path), 0, time.time()]
+            entry[1] += 1
+
+            return entry[0]
+
+    def release(self, session_id):
+        ''' Drop a reference to the workspace of the session. It
+        is removed once unreferenced for longer than the ttl '''
+        with self.__lock:
+            entry = self.__entries.get(session_id)
+            if entry is not None:
+                entry[1] = max(entry[1] - 1, 0)
+                entry[2] = time.time()
+
+    @contextmanager
+    def use(self, session_id):
+        ''' Hold the workspace of the session
+        for the duration of the block '''
+        workspace = self.acquire(session_id)
+        try:
+            yield workspace
+        finally:
+            self.release(session_id)
+
+    def __sweep(self):
+        ''' Remove the workspaces nobody has used for a while '''
+        now = time.time()
+        for session_id, (workspace, references, released) in list(self.__entries.items()):
+            if not references and now - released > self.ttl:
+                shutil.rmtree(workspace.path, ignore_errors=True)
+                del self.__entries[session_id]
+
+# Workspaces of all the sessions of the process
+WORKSPACES = WorkspaceManager(default_root())